@@ -0,0 +1,499 @@
+"""Many matches of the arena stepped at once on NumPy arrays, for tuning.
+
+    python batchsim.py --games 1000
+
+Plays GreedyPolicy against itself in every game, then steps simulator.Game
+one match at a time with --agent on both sides for as long, and prints the
+ticks a second of each.
+"""
+import argparse
+import contextlib
+import os
+import time
+
+import numpy as np
+
+from scoring import DIRECTIONS
+import simulator
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))  # Where the agent files are
+
+STAY, UP, DOWN, LEFT, RIGHT, BOMB = range(6)
+ACTIONS = ("", "u", "d", "l", "r", "b")  # Action code: the agents' action
+STEPS = (UP, DOWN, LEFT, RIGHT)
+
+NO_BOMB = -1
+UNREACHED = 2**15 - 1
+
+
+def shift(grids, dx, dy, fill):
+    """scoring.shift over the last two axes, for a stack of grids"""
+    width, height = grids.shape[-2:]
+    source = (
+        Ellipsis,
+        slice(max(dx, 0), width + min(dx, 0)),
+        slice(max(dy, 0), height + min(dy, 0)),
+    )
+    target = (
+        Ellipsis,
+        slice(max(-dx, 0), width + min(-dx, 0)),
+        slice(max(-dy, 0), height + min(-dy, 0)),
+    )
+    shifted = np.full_like(grids, fill)
+    shifted[target] = grids[source]
+    return shifted
+
+
+def column_type(height):
+    """The narrowest unsigned type with a bit for each tile of a column"""
+    for name in ("<u2", "<u4", "<u8"):
+        if height <= 8 * np.dtype(name).itemsize:
+            return np.dtype(name)
+    raise ValueError("Arena too high for column bitmasks: {}".format(height))
+
+
+def to_columns(grids):
+    """Each column of bool grids [..., x, y] as a bitmask of its tiles by y"""
+    dtype = column_type(grids.shape[-1])
+    packed = np.packbits(grids, axis=-1, bitorder="little")
+    padded = np.zeros(grids.shape[:-1] + (dtype.itemsize,), np.uint8)
+    padded[..., : packed.shape[-1]] = packed
+    return padded.view(dtype)[..., 0]
+
+
+def from_columns(columns, height):
+    data = np.ascontiguousarray(columns)[..., None].view(np.uint8)
+    return np.unpackbits(data, axis=-1, count=height, bitorder="little").view(bool)
+
+
+def blast_sum(sources, open):
+    """Per tile, the sum of sources over the tiles whose blast reaches it.
+
+    A blast covers its own tile and runs two tiles each way, stopping at the
+    first tile that isn't open. Blasts reach symmetrically, so this is also
+    the sum of sources over the blast of a bomb on each tile.
+    """
+    total = sources.astype(np.int32)
+    for dx, dy in DIRECTIONS:
+        total += shift(sources, dx, dy, 0)
+        total += shift(sources, 2 * dx, 2 * dy, 0) * shift(open, dx, dy, False)
+    return total
+
+
+def in_blast(bombs, open):
+    """Bool grids of the tiles the blast of some bomb in bombs reaches"""
+    reached = bombs.copy()
+    for dx, dy in DIRECTIONS:
+        reached |= shift(bombs, dx, dy, False)
+        reached |= shift(bombs, 2 * dx, 2 * dy, False) & shift(open, dx, dy, False)
+    return reached
+
+
+class BatchGame:
+    """simulator.Game's rules for many independent matches at once.
+
+    Every grid is indexed [game, x, y] and every player array [game, pid],
+    and step takes an action code per game and player. Finished games
+    freeze, their actions ignored, while the rest play on.
+
+    Layouts are random per game and not Game's layout for a seed. Chains go
+    off a wave at a time rather than one bomb after another, so bombs in
+    the same wave blast the board as it was before any of them, and a
+    block or hit two bombs of a wave reach is credited to player 0's.
+    """
+
+    SIZE = simulator.Game.SIZE
+    MAX_TICKS = simulator.Game.MAX_TICKS
+    PLAYERS = 2
+    FIELDS = (
+        "solid",
+        "soft",
+        "ore_hits",
+        "ammo_drops",
+        "treasure",
+        "bomb_ticks",
+        "owners",
+        "x",
+        "y",
+        "ammo",
+        "hp",
+        "rewards",
+        "ticks",
+    )  # The per game arrays
+    RETIRE_SHARE = 0.25
+
+    def __init__(self, count, seed=0, max_ticks=None):
+        self.count = count
+        self.rng = np.random.default_rng(seed)
+        self.width, self.height = self.SIZE
+        self.max_ticks = self.MAX_TICKS if max_ticks is None else max_ticks
+        self.games = np.arange(count)
+
+        game = simulator.Game
+        shape = (count, self.width, self.height)
+        order = self.rng.random((count, self.width * self.height)).argsort(axis=1)
+        ranks = order.argsort(axis=1).reshape(shape)  # Each tile's place in order
+        first = game.INDESTRUCTIBLE_BLOCK_COUNT
+        second = first + game.SOFT_BLOCK_COUNT
+        third = second + game.ORE_BLOCK_COUNT
+        self.solid = ranks < first
+        self.soft = (ranks >= first) & (ranks < second)
+        ore = (ranks >= second) & (ranks < third)
+        self.ore_hits = np.where(ore, game.ORE_HITS, 0).astype(np.int8)
+        self.ammo_drops = np.zeros(shape, bool)
+        self.treasure = np.zeros(shape, bool)
+        self.bomb_ticks = np.full(shape, NO_BOMB, np.int32)
+        self.owners = np.zeros(shape, np.int8)
+
+        # Like Game, the players take the last free tiles, player 0 the last
+        last = order[:, [-1, -2]]
+        self.x, self.y = last // self.height, last % self.height
+        self.ammo = np.full((count, self.PLAYERS), game.START_AMMO, np.int32)
+        self.hp = np.full((count, self.PLAYERS), game.START_HP, np.int32)
+        self.rewards = np.zeros((count, self.PLAYERS), np.int32)
+        self.ticks = np.zeros(count, np.int32)
+
+    def is_over(self):
+        """Bool per game"""
+        return (self.ticks >= self.max_ticks) | (self.hp <= 0).any(axis=1)
+
+    def blocked(self):
+        bombs = self.bomb_ticks != NO_BOMB
+        return self.solid | self.soft | (self.ore_hits > 0) | bombs
+
+    def step(self, actions):
+        """Steps every unfinished game by actions, an int array [game, pid]"""
+        game = simulator.Game
+        games = self.games
+        active = ~self.is_over()
+        for pid in range(self.PLAYERS):
+            action = np.where(active, actions[:, pid], STAY)
+            x, y = self.x[:, pid], self.y[:, pid]
+            bombing = (
+                (action == BOMB)
+                & (self.ammo[:, pid] > 0)
+                & (self.bomb_ticks[games, x, y] == NO_BOMB)
+            )
+            planted = (games[bombing], x[bombing], y[bombing])
+            self.bomb_ticks[planted] = self.ticks[bombing]
+            self.owners[planted] = pid
+            self.ammo[bombing, pid] -= 1
+
+            dx, dy = np.zeros((2, self.count), np.intp)
+            for move in STEPS:
+                dx[action == move], dy[action == move] = game.MOVES[ACTIONS[move]]
+            tx, ty = x + dx, y + dy
+            inside = (tx >= 0) & (tx < self.width) & (ty >= 0) & (ty < self.height)
+            tx, ty = np.where(inside, tx, x), np.where(inside, ty, y)
+            moving = inside & ~self.blocked()[games, tx, ty]
+            for other in range(self.PLAYERS):
+                if other != pid:
+                    moving &= (self.x[:, other] != tx) | (self.y[:, other] != ty)
+            self.x[moving, pid] = tx[moving]
+            self.y[moving, pid] = ty[moving]
+
+        for pid in range(self.PLAYERS):
+            tile = (games, self.x[:, pid], self.y[:, pid])
+            ammo = self.ammo_drops[tile]
+            treasure = self.treasure[tile] & ~ammo
+            self.ammo_drops[tile] = False
+            self.ammo[:, pid] += ammo
+            self.treasure[tile] &= ~treasure
+            self.rewards[:, pid] += game.TREASURE_REWARD * treasure
+
+        self.explode(active)
+        self.ticks += active
+        self.spawn(active)
+
+    def explode(self, active):
+        """Sets off the bombs due, and in waves any bombs their blasts reach.
+
+        Each wave blasts the board the waves before it left, through the
+        tiles of bombs already gone off and blocks already destroyed, as
+        Game's one bomb at a time chains do.
+        """
+        game = simulator.Game
+        fuse = self.ticks[:, None, None] - self.bomb_ticks >= game.BOMB_FUSE
+        going = (self.bomb_ticks != NO_BOMB) & fuse & active[:, None, None]
+        hit = np.zeros((self.count, self.PLAYERS), bool)  # Once a tick at most
+        while going.any():
+            open = ~self.blocked()
+            self.bomb_ticks[going] = NO_BOMB
+            hits = [blast_sum(going & (self.owners == pid), open) for pid in (0, 1)]
+            covered = (hits[0] + hits[1]) > 0
+            # Whose blast a tile counts for, a bomb's own tile always its owner's
+            credited = np.where(going, self.owners, np.where(hits[0] > 0, 0, 1))
+
+            broken = (self.ore_hits > 0) & (self.ore_hits <= hits[0] + hits[1])
+            for pid in range(self.PLAYERS):
+                soft = self.soft & covered & (credited == pid)
+                ore = broken & (credited == pid)
+                self.rewards[:, pid] += game.SOFT_BLOCK_REWARD * soft.sum(axis=(1, 2))
+                self.rewards[:, pid] += game.ORE_BLOCK_REWARD * ore.sum(axis=(1, 2))
+            self.soft &= ~covered
+            left = np.maximum(self.ore_hits - hits[0] - hits[1], 0)
+            self.ore_hits = left.astype(np.int8)
+            self.ammo_drops &= ~covered
+            self.treasure &= ~covered
+
+            # A player on a bomb this wave sets off is hit by that bomb, next wave
+            chained = (self.bomb_ticks != NO_BOMB) & covered
+            for pid in range(self.PLAYERS):
+                tile = (self.games, self.x[:, pid], self.y[:, pid])
+                newly = covered[tile] & ~chained[tile] & ~hit[:, pid]
+                hit[:, pid] |= newly
+                self.hp[:, pid] -= newly
+                scored = newly & (credited[tile] != pid)
+                self.rewards[scored, credited[tile][scored]] += game.HIT_REWARD
+
+            going = chained
+
+    def spawn(self, active):
+        game = simulator.Game
+        free = ~self.blocked() & ~self.ammo_drops & ~self.treasure
+        for pid in range(self.PLAYERS):
+            free[self.games, self.x[:, pid], self.y[:, pid]] = False
+        for interval, pickups in (
+            (game.AMMO_SPAWN_INTERVAL, self.ammo_drops),
+            (game.TREASURE_SPAWN_INTERVAL, self.treasure),
+        ):
+            due = active & (self.ticks % interval == 0) & free.any(axis=(1, 2))
+            if not due.any():
+                continue
+            games = self.games[due]
+            scores = np.where(free[due], self.rng.random(free[due].shape), -1)
+            tiles = scores.reshape(len(games), -1).argmax(axis=1)
+            x, y = tiles // self.height, tiles % self.height
+            pickups[games, x, y] = True
+            free[games, x, y] = False
+
+    def take(self, games):
+        """A BatchGame of the games at the given indices, sharing our dice"""
+        taken = object.__new__(BatchGame)
+        taken.__dict__.update(self.__dict__)
+        taken.count = len(games)
+        taken.games = np.arange(taken.count)
+        for field in self.FIELDS:
+            setattr(taken, field, getattr(self, field)[games])
+        return taken
+
+    def put(self, games, batch):
+        """Copies the games of batch back to the given indices"""
+        for field in self.FIELDS:
+            getattr(self, field)[games] = getattr(batch, field)
+
+    def run(self, policy):
+        """Plays every game out, policy(batch) giving each tick's actions.
+
+        Finished games are dropped from the batch once they are more than
+        RETIRE_SHARE of it, so the long games left don't pay for the rest.
+        """
+        games = self.games
+        batch = self
+        while True:
+            over = batch.is_over()
+            if over.all():
+                break
+            if over.mean() > self.RETIRE_SHARE:
+                self.put(games, batch)
+                games = games[~over]
+                batch = self.take(games)
+            batch.step(policy(batch))
+        self.put(games, batch)
+        return self.result()
+
+    def result(self):
+        """Game.result's ticks, winner, scores and hp as arrays, winner -1 a draw"""
+        alive = self.hp > 0
+        winner = np.full(self.count, -1)
+        by_reward = self.rewards[:, 0] != self.rewards[:, 1]
+        winner[by_reward] = self.rewards[by_reward, 1] > self.rewards[by_reward, 0]
+        by_hp = alive[:, 0] != alive[:, 1]
+        winner[by_hp] = alive[by_hp, 1]
+        return {
+            "ticks": self.ticks.copy(),
+            "winner": winner,
+            "scores": self.rewards.copy(),
+            "hp": self.hp.copy(),
+        }
+
+
+class GreedyPolicy:
+    """The agents' greedy play, for every game and player at once.
+
+    A tile is worth what a bomb there would destroy, scored like
+    bombing_value, plus any pickup on it. Each player follows a breadth
+    first search towards the reachable tile out of every blast with the
+    most worth per step, bombs once it stands on it if there's a way out of
+    its own blast, and runs for the nearest tile out of every blast when
+    caught in one. With nothing worth having it wanders at random.
+
+    The search keeps each column of the arena as a bitmask of its tiles,
+    one per game, so a step of it is a few shifts of a small array.
+    """
+
+    SOFT_VALUE = 2
+    ORE_VALUE = 10  # For ore one hit from breaking
+    AMMO_VALUE = 3
+    TREASURE_VALUE = 1
+    SEARCH_DEPTH = 16
+
+    def __init__(self, rng=None):
+        self.rng = np.random.default_rng() if rng is None else rng
+
+    def __call__(self, game):
+        actions = np.empty((game.count, game.PLAYERS), np.intp)
+        blocked = game.blocked()
+        open = ~blocked
+        danger = in_blast(game.bomb_ticks != NO_BOMB, open)
+        targets = self.SOFT_VALUE * game.soft + self.ORE_VALUE * (game.ore_hits == 1)
+        bomb_values = blast_sum(targets, open)
+        pickups = self.AMMO_VALUE * game.ammo_drops
+        pickups += self.TREASURE_VALUE * game.treasure
+        for pid in range(game.PLAYERS):
+            actions[:, pid] = self.choose(
+                game, pid, blocked, open, danger, bomb_values, pickups
+            )
+        return actions
+
+    def search(self, game, pid, walkable):
+        """(steps, routes) from player pid over walkable.
+
+        steps is the steps to each tile, UNREACHED past SEARCH_DEPTH, and
+        routes[i] the column bitmasks of the tiles a shortest route starting
+        with STEPS[i] reaches.
+        """
+        open_columns = to_columns(walkable)
+        column = open_columns.dtype.type
+        full = column((1 << game.height) - 1)
+
+        def step(columns, move):
+            if move == UP:
+                return (columns << column(1)) & full
+            if move == DOWN:
+                return columns >> column(1)
+            moved = np.zeros_like(columns)
+            if move == LEFT:
+                moved[..., :-1] = columns[..., 1:]
+            else:
+                moved[..., 1:] = columns[..., :-1]
+            return moved
+
+        start = np.zeros_like(open_columns)
+        start[game.games, game.x[:, pid]] = column(1) << game.y[:, pid].astype(column)
+        routes = np.stack([step(start, move) for move in STEPS]) & open_columns
+        reached = start | np.bitwise_or.reduce(routes)
+        levels = [start, reached & ~start]
+        frontier = routes
+        for _ in range(self.SEARCH_DEPTH - 1):
+            grown = np.zeros_like(frontier)
+            for move in STEPS:
+                grown |= step(frontier, move)
+            grown &= open_columns & ~reached
+            found = np.bitwise_or.reduce(grown)
+            if not found.any():
+                break
+            routes |= grown
+            reached |= found
+            levels.append(found)
+            frontier = grown
+
+        # The levels don't overlap, so a tile's steps is the one it's set in
+        in_level = from_columns(np.stack(levels), game.height)
+        depth = np.arange(len(levels), dtype=np.int16)[:, None, None, None]
+        steps = (in_level * depth).sum(axis=0, dtype=np.int16)
+        steps[~from_columns(reached, game.height)] = UNREACHED
+        return steps, routes
+
+    def first_step(self, game, routes, x, y):
+        """The first step of a shortest route to each game's tile (x, y)"""
+        on_route = ((routes[:, game.games, x] >> y.astype(routes.dtype)) & 1) > 0
+        moves = np.array(STEPS)[on_route.argmax(axis=0)]
+        return np.where(on_route.any(axis=0), moves, STAY)
+
+    def choose(self, game, pid, blocked, open, danger, bomb_values, pickups):
+        games = game.games
+        height = game.height
+        x, y = game.x[:, pid], game.y[:, pid]
+        walkable = ~blocked
+        for other in range(game.PLAYERS):
+            if other != pid:
+                walkable[games, game.x[:, other], game.y[:, other]] = False
+        steps, routes = self.search(game, pid, walkable)
+        safe = (steps != UNREACHED) & ~danger
+
+        # Caught in a blast, make for the nearest tile out of every blast
+        nearest = np.where(safe, steps, UNREACHED).reshape(game.count, -1)
+        nearest = nearest.argmin(axis=1)
+        escape = self.first_step(game, routes, nearest // height, nearest % height)
+
+        has_ammo = game.ammo[:, pid] > 0
+        worth = bomb_values * has_ammo[:, None, None] + pickups
+        score = np.where(safe, worth / (1.0 + steps), 0).reshape(game.count, -1)
+        best = score.argmax(axis=1)
+        best_x, best_y = best // height, best % height
+        moves = self.first_step(game, routes, best_x, best_y)
+
+        # Bomb where we stand when it's the best tile and there's a way out
+        own_blast = np.zeros_like(blocked)
+        own_blast[games, x, y] = True
+        own_blast = in_blast(own_blast, open)
+        way_out = (safe & ~own_blast).any(axis=(1, 2))
+        bombing = (
+            (best_x == x)
+            & (best_y == y)
+            & has_ammo
+            & (bomb_values[games, x, y] > 0)
+            & (game.bomb_ticks[games, x, y] == NO_BOMB)
+            & way_out
+        )
+
+        idle = score[games, best] <= 0
+        actions = np.where(idle, self.rng.integers(STAY, BOMB, game.count), moves)
+        actions = np.where(bombing, BOMB, actions)
+        return np.where(danger[games, x, y], escape, actions)
+
+
+def get_single_game_rate(path, seconds):
+    """Ticks a second of simulator.Game with the agent at path on both sides"""
+    simulator.install_stand_in()
+    agent_class = simulator.load_agent_class(path)
+    ticks = 0
+    seed = 0
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        while time.perf_counter() - start < seconds:
+            game = simulator.Game(agent_class(), agent_class(), seed=seed)
+            while not game.is_over() and time.perf_counter() - start < seconds:
+                game.step()
+                ticks += 1
+            seed += 1
+    return ticks / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-ticks", type=int, default=BatchGame.MAX_TICKS)
+    parser.add_argument("--agent", default=os.path.join(DIRECTORY, "primary-agent.py"))
+    args = parser.parse_args()
+
+    game = BatchGame(args.games, seed=args.seed, max_ticks=args.max_ticks)
+    policy = GreedyPolicy(np.random.default_rng(args.seed))
+    start = time.perf_counter()
+    result = game.run(policy)
+    elapsed = time.perf_counter() - start
+    ticks = int(result["ticks"].sum())
+    single = get_single_game_rate(args.agent, elapsed)
+    wins = [int((result["winner"] == side).sum()) for side in (0, 1, -1)]
+    print("{} games, {} ticks in {:.1f}s".format(args.games, ticks, elapsed))
+    print("batched    {:>10.0f} ticks/s".format(ticks / elapsed))
+    agent = os.path.basename(args.agent)
+    print("simulator  {:>10.0f} ticks/s, {}".format(single, agent))
+    print("wins 0/1/draw {}/{}/{}".format(*wins))
+    print("mean score {:.1f}".format(result["scores"].mean()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Tracked bombs linked into chain reactions"""
+import heapq
+
+
+class BombGraph:
+    """Bombs joined to the bombs their blasts reach.
+
+    A bomb goes off FUSE ticks after it was first seen, or CHAIN_DELAY ticks
+    after any bomb whose blast reaches it, whichever is sooner, so detonation
+    ticks are shortest paths through the graph. Chains go off within the same
+    tick, as simulator.Game and lookahead.ArenaState detonate them. Adding or
+    refreshing a bomb only re-resolves the chain it belongs to.
+    scoring.DangerMap turns the detonation ticks into the danger of each tile.
+    """
+
+    FUSE = 35
+    CHAIN_DELAY = 0
+
+    def __init__(self):
+        self.planted = {}  # Location: tick first seen
+        self.blasts = {}  # Location: tiles its blast covers
+        self.links = {}  # Location: other bombs its blast reaches
+        self.detonations = {}  # Location: tick it goes off, chains included
+        self.covering = {}  # Tile: bombs whose blast covers it
+
+    def __contains__(self, location):
+        return location in self.planted
+
+    def __iter__(self):
+        return iter(self.planted)
+
+    def __len__(self):
+        return len(self.planted)
+
+    def add(self, location, tick, blast):
+        self.planted[location] = tick
+        self.links[location] = set()
+        self.set_blast(location, blast)
+        self.resolve([location])
+
+    def refresh(self, tiles, get_blast):
+        """Recomputes the blasts that cover tiles, after they changed on the board"""
+        stale = set()
+        for tile in tiles:
+            stale.update(self.covering.get(tile, ()))
+        for location in stale:
+            self.set_blast(location, get_blast(location))
+        self.resolve(stale)
+
+    def remove(self, location):
+        del self.planted[location]
+        del self.detonations[location]
+        for other in self.links.pop(location):
+            self.links[other].discard(location)
+        for tile in self.blasts.pop(location):
+            self.discard_cover(tile, location)
+
+    def expire(self, tick):
+        """Forgets every bomb that has gone off before tick"""
+        for location, detonation in list(self.detonations.items()):
+            if detonation < tick:
+                self.remove(location)
+
+    def set_blast(self, location, blast):
+        """Relinks location for a new blast"""
+        for tile in self.blasts.get(location, ()):
+            self.discard_cover(tile, location)
+        for other in self.links[location]:
+            self.links[other].discard(location)
+        tiles = (location,) + tuple(blast)
+        self.blasts[location] = tiles
+        links = set()
+        for tile in tiles:
+            self.covering.setdefault(tile, set()).add(location)
+            if tile != location and tile in self.planted:
+                links.add(tile)
+                self.links[tile].add(location)
+        self.links[location] = links
+
+    def discard_cover(self, tile, location):
+        bombs = self.covering[tile]
+        bombs.discard(location)
+        if not bombs:
+            del self.covering[tile]
+
+    def resolve(self, locations):
+        """Recomputes detonation ticks for every chain touching locations"""
+        chain = set(locations)
+        frontier = list(chain)
+        while frontier:
+            location = frontier.pop()
+            for other in self.links[location]:
+                if other not in chain:
+                    chain.add(other)
+                    frontier.append(other)
+
+        # Never put a detonation back, the bomb that set it off may be gone
+        detonations = {}
+        heap = []
+        for location in chain:
+            fuse = self.planted[location] + self.FUSE
+            heap.append((self.detonations.get(location, fuse), location))
+        heapq.heapify(heap)
+        while heap:
+            tick, location = heapq.heappop(heap)
+            if location in detonations:
+                continue
+            detonations[location] = tick
+            for other in self.links[location]:
+                if other not in detonations:
+                    heapq.heappush(heap, (tick + self.CHAIN_DELAY, other))
+        self.detonations.update(detonations)
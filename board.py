@@ -0,0 +1,170 @@
+"""Bitboard snapshot of the arena, built once per tick"""
+import copy
+
+
+class Board:
+    """Stores each entity class as an integer bitmask over every tile.
+
+    Tile (x, y) is bit x + y * width. Whole board set operations are plain
+    integer operations on the masks.
+    """
+
+    BOMB = "b"
+    INDESTRUCTIBLE_BLOCK = "ib"
+    ORE_BLOCK = "ob"
+    SOFT_BLOCK = "sb"
+    AMMO = "a"
+    TREASURE = "t"
+
+    def __init__(self, game_state, player_state):
+        self.width, self.height = game_state.size
+        self.cell_count = self.width * self.height
+        self.full = (1 << self.cell_count) - 1
+
+        self.player_id = player_state.id
+        self.enemy_id = int(player_state.id == 0)
+        self.player_location = player_state.location
+        opponents = game_state.opponents(player_state.id)
+        self.enemy_location = opponents[0] if opponents else None
+
+        self.soft_blocks = self.mask(game_state.soft_blocks)
+        self.ore_blocks = self.mask(game_state.ore_blocks)
+        self.indestructible_blocks = self.mask(game_state.indestructible_blocks)
+        self.bombs = self.mask(game_state.bombs)
+        self.ammo = self.mask(game_state.ammo)
+        self.treasure = self.mask(game_state.treasure)
+        self.player = self.mask([player_state.location])
+        self.enemy = self.mask(opponents)
+
+        # Tiles that can't be walked through and stop a blast
+        self.blocked = (
+            self.soft_blocks | self.ore_blocks | self.indestructible_blocks | self.bombs
+        )
+        self.occupied = (
+            self.blocked | self.ammo | self.treasure | self.player | self.enemy
+        )
+
+    def moved(self, location):
+        """Copy of this board with our player standing on location"""
+        board = copy.copy(self)
+        board.player_location = location
+        board.player = self.mask([location])
+        board.occupied = (self.occupied & ~self.player) | board.player
+        return board
+
+    def same_layout(self, other):
+        """True if every mask except the enemy's matches other"""
+        return (
+            self.soft_blocks == other.soft_blocks
+            and self.ore_blocks == other.ore_blocks
+            and self.indestructible_blocks == other.indestructible_blocks
+            and self.bombs == other.bombs
+            and self.ammo == other.ammo
+            and self.treasure == other.treasure
+            and self.player == other.player
+        )
+
+    def index(self, location):
+        return location[0] + location[1] * self.width
+
+    def location(self, index):
+        return index % self.width, index // self.width
+
+    def bit(self, location):
+        """Mask for a single tile, 0 if the tile is out of bounds"""
+        x, y = location
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return 1 << (x + y * self.width)
+        return 0
+
+    def mask(self, locations):
+        mask = 0
+        for location in locations:
+            mask |= self.bit(location)
+        return mask
+
+    def locations(self, mask):
+        """Yields the location of every set bit in mask"""
+        while mask:
+            low = mask & -mask
+            yield self.location(low.bit_length() - 1)
+            mask ^= low
+
+    def count(self, mask):
+        return bin(mask).count("1")
+
+    def is_in_bounds(self, location):
+        return 0 <= location[0] < self.width and 0 <= location[1] < self.height
+
+    def is_occupied(self, location):
+        return bool(self.bit(location) & self.occupied)
+
+    def blocks_blast(self, location):
+        return bool(self.bit(location) & self.blocked)
+
+    def is_moveable_to(self, location, skip_enemy=False):
+        bit = self.bit(location)
+        if not bit or bit & self.blocked:
+            return False
+        return skip_enemy or not bit & self.enemy
+
+    def entity_at(self, location):
+        """Same tile codes as GameState.entity_at"""
+        bit = self.bit(location)
+        if not bit & self.occupied:
+            return None
+        if bit & self.bombs:
+            return self.BOMB
+        if bit & self.soft_blocks:
+            return self.SOFT_BLOCK
+        if bit & self.ore_blocks:
+            return self.ORE_BLOCK
+        if bit & self.indestructible_blocks:
+            return self.INDESTRUCTIBLE_BLOCK
+        if bit & self.enemy:
+            return self.enemy_id
+        if bit & self.player:
+            return self.player_id
+        if bit & self.ammo:
+            return self.AMMO
+        return self.TREASURE
+
+
+class Arena:
+    """Lookup tables for the fixed arena geometry, built once per game"""
+
+    BLAST_RADIUS = 2
+
+    def __init__(self, size):
+        self.width, self.height = size
+        self.neighbours = {}
+        self.blast_rays = {}
+        for x in range(self.width):
+            for y in range(self.height):
+                location = (x, y)
+                self.neighbours[location] = self.get_neighbours(location)
+                self.blast_rays[location] = self.get_blast_rays(location)
+
+    def is_in_bounds(self, location):
+        return 0 <= location[0] < self.width and 0 <= location[1] < self.height
+
+    def get_neighbours(self, location):
+        """Up, right, down, left neighbours that are within the arena"""
+        x, y = location
+        candidates = ((x, y + 1), (x + 1, y), (x, y - 1), (x - 1, y))
+        return tuple(tile for tile in candidates if self.is_in_bounds(tile))
+
+    def get_blast_rays(self, location):
+        """Left, right, down, up rays of tiles a bomb here could reach, nearest first"""
+        x, y = location
+        rays = []
+        for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+            ray = []
+            for distance in range(1, self.BLAST_RADIUS + 1):
+                tile = (x + dx * distance, y + dy * distance)
+                if not self.is_in_bounds(tile):
+                    break
+                ray.append(tile)
+            if ray:
+                rays.append(tuple(ray))
+        return tuple(rays)
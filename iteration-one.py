@@ -1,6 +1,9 @@
 """File for primary agent"""
 import random
 
+from board import Board
+import scoring
+
 
 class Agent:
     """Class for primary agent"""
@@ -20,17 +23,22 @@ class Agent:
         self.updated = True
         self.action_queue = []
         self.bombs = {}
+        self.danger = None
         self.ores = {}
         self.first = True
 
     def next_move(self, game_state, player_state):
         """This method is called each time the player needs to choose an action"""
         self.game_state = game_state
+        self.board = Board(game_state, player_state)
         self.player_state = player_state
         if self.first:
             self.on_first()
 
         self.track_bombs(game_state.bombs)
+        self.danger = scoring.DangerMap.from_game_state(
+            game_state, self.bombs, ore_blocks_stop=False
+        )
         updated = game_state.tick_number != self.tick_number
         self.tick_number = game_state.tick_number
         # if not updated:
@@ -91,28 +99,25 @@ class Agent:
                     coords = list(loc)
                     coords[axis] += distance * direction
                     coords = tuple(coords)
-                    if self.game_state.is_in_bounds(coords):
+                    if self.board.is_in_bounds(coords):
                         affected.append(coords)
-                        if self.game_state.entity_at(coords) in ["b", "ib", "ob", "sb"]:
+                        if self.board.entity_at(coords) in ["b", "ib", "ob", "sb"]:
                             break
         return affected
 
     def is_moveable_to(self, location):
-        entity = self.game_state.entity_at(location)
+        entity = self.board.entity_at(location)
         return entity in ["b", "ib", "ob", "sb", "0", "1"]
 
     def in_bomb_radius(self, location, time_remaining=None):
-        for bomb in self.bombs.keys():
-            if location in self.bomb_affect(bomb):
-                if time_remaining is None or (self.tick_number - self.bombs[bomb]) > (
-                    35 - time_remaining
-                ):
-                    return True
-        return False
+        detonation_tick = self.danger.get(location)
+        if time_remaining is None:
+            return detonation_tick != scoring.NO_DANGER
+        return detonation_tick < self.tick_number + time_remaining
 
     def avoid_bombs(self, location):
         for loc in self.get_surrounding_tiles(location):
-            if not (self.game_state.is_occupied(loc) or self.in_bomb_radius(loc)):
+            if not (self.board.is_occupied(loc) or self.in_bomb_radius(loc)):
                 return loc
 
     def find_best_bombing_location(self, location):
@@ -137,7 +142,7 @@ class Agent:
     def bombing_value(self, loc):
         points = 0
 
-        entity = self.game_state.entity_at(loc)
+        entity = self.board.entity_at(loc)
         if entity == "t":
             points += 1
         elif entity == "a":
@@ -150,7 +155,7 @@ class Agent:
             affected = self.bomb_affect(loc)
             affected.pop(0)
             for location in affected:
-                entity = self.game_state.entity_at(location)
+                entity = self.board.entity_at(location)
                 if self.in_bomb_radius(location):
                     continue
                 if entity == "sb":
@@ -169,9 +174,7 @@ class Agent:
             (location[0] - 1, location[1]),
             (location[0] + 1, location[1]),
         ]
-        return [
-            tile for tile in surrounding_tiles if self.game_state.is_in_bounds(tile)
-        ]
+        return [tile for tile in surrounding_tiles if self.board.is_in_bounds(tile)]
 
     def move_to_tile(self, location, tile):
         """Movement input is calculated based on target tile distance delta"""
@@ -192,6 +195,6 @@ class Agent:
         """Get empty tiles from list of tiles"""
         empty_tiles = []
         for tile in tiles:
-            if not self.game_state.is_occupied(tile):
+            if not self.board.is_occupied(tile):
                 empty_tiles.append(tile)
         return empty_tiles
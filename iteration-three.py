@@ -1,6 +1,10 @@
 """File for primary agent"""
 from coderone.dungeon.agent import PlayerState, GameState
 
+from board import Board
+import pathing
+import scoring
+
 
 class Agent:
     """Class for primary agent"""
@@ -30,6 +34,8 @@ class Agent:
     def __init__(self):
         self.tick_number = -1
         self.bombs = {}
+        self.search_nodes = None
+        self.danger = None
         self.first = True
         self.target = None
         self.path = []
@@ -45,6 +51,7 @@ class Agent:
         """This method is called each time the player needs to choose an action"""
 
         self.game_state = game_state
+        self.board = Board(game_state, player_state)
         self.player_state = player_state
 
         if self.first:
@@ -53,9 +60,9 @@ class Agent:
 
         if self.desync_count > self.MAX_DESYNC:
             self.player_location = player_state.location
-            entity_at_current_loc = game_state.entity_at(player_state.location)
+            entity_at_current_loc = self.board.entity_at(player_state.location)
         else:
-            entity_at_current_loc = game_state.entity_at(self.player_location)
+            entity_at_current_loc = self.board.entity_at(self.player_location)
 
         recent_history = self.move_history[
             -min(self.MAX_DESYNC, len(self.move_history)) :
@@ -69,6 +76,7 @@ class Agent:
 
         self.tick_number = game_state.tick_number
         self.track_bombs(game_state.bombs)
+        self.danger = scoring.DangerMap.from_game_state(game_state, self.bombs)
 
         if self.synced:
             self.desync_count = 0
@@ -93,11 +101,12 @@ class Agent:
         return move
 
     def is_moveable_to(self, location):
-        entity = self.game_state.entity_at(location)
+        entity = self.board.entity_at(location)
         return entity not in ["b", "ib", "ob", "sb", int(self.player_state.id == 0)]
 
     def on_first(self):
         self.first = False
+        self.search_nodes = pathing.SearchNodes(*self.game_state.size)
         self.ores = {ore: 3 for ore in self.game_state.ore_blocks}
 
     def update_game_stage(self):
@@ -163,27 +172,24 @@ class Agent:
                     coords = list(loc)
                     coords[axis] += distance * direction
                     coords = tuple(coords)
-                    if self.game_state.is_in_bounds(coords):
-                        if distance > 1 and self.game_state.entity_at(coords) == "ob":
+                    if self.board.is_in_bounds(coords):
+                        if distance > 1 and self.board.entity_at(coords) == "ob":
                             break
                         affected.append(coords)
-                        if self.game_state.entity_at(coords) in ["b", "ib", "ob", "sb"]:
+                        if self.board.entity_at(coords) in ["b", "ib", "ob", "sb"]:
                             break
         return affected
 
     def in_bomb_radius(self, location, time_remaining=None):
-        for bomb in self.bombs.keys():
-            if location in self.bomb_affect(bomb):
-                if time_remaining is None or (self.tick_number - self.bombs[bomb]) > (
-                    35 - time_remaining
-                ):
-                    return True
-        return False
+        detonation_tick = self.danger.get(location)
+        if time_remaining is None:
+            return detonation_tick != scoring.NO_DANGER
+        return detonation_tick < self.tick_number + time_remaining
 
     def bombing_value(self, loc, inculde_pickups=True):
         points = 0
 
-        entity = self.game_state.entity_at(loc)
+        entity = self.board.entity_at(loc)
         if inculde_pickups:
             if entity == "t":
                 points += 1
@@ -201,7 +207,7 @@ class Agent:
                     diff = tuple((x - y) * -1 for x, y in zip(loc, location))
                     if (loc[0] + diff[0], loc[1] + diff[1]) in self.bombs:
                         continue
-                entity = self.game_state.entity_at(location)
+                entity = self.board.entity_at(location)
                 if entity == "ob" and (
                     (
                         self.game_stage == self.MIDDLE
@@ -230,9 +236,7 @@ class Agent:
             (location[0] - 1, location[1]),
             (location[0] + 1, location[1]),
         ]
-        return [
-            tile for tile in surrounding_tiles if self.game_state.is_in_bounds(tile)
-        ]
+        return [tile for tile in surrounding_tiles if self.board.is_in_bounds(tile)]
 
     def move_to_tile(self, current_location, destination):
         """Movement input is calculated based on target tile distance delta"""
@@ -332,66 +336,12 @@ class Agent:
                         return self.move_to_tile(self.player_state.location, tile)
 
     def generate_path(self, location, target, max_count=200):
-        start_node = Node(None, location)
-        start_node.g = start_node.h = start_node.f = 0
-        end_node = Node(None, target)
-        end_node.g = end_node.h = end_node.f = 0
-        open_list = []
-        closed_list = []
-        open_list.append(start_node)
-        iter_count = 0
-        while iter_count < max_count and len(open_list) > 0:
-            iter_count += 1
-            current_node = open_list[0]
-            current_index = 0
-            for index, item in enumerate(open_list):
-                if item.f < current_node.f:
-                    current_node = item
-                    current_index = index
-            open_list.pop(current_index)
-            closed_list.append(current_node)
-
-            if current_node == end_node:
-                path = []
-                current = current_node
-                while current is not None:
-                    path.append(current.position)
-                    current = current.parent
-                path.pop()
-                return path
-
-            children = []
-            for node_position in self.get_surrounding_tiles(current_node.position):
-                if not self.is_moveable_to(node_position):
-                    continue
-                new_node = Node(current_node, node_position)
-                children.append(new_node)
-
-            for child in children:
-                for closed_child in closed_list:
-                    if child == closed_child:
-                        continue
-                child.g = current_node.g + 1
-                child.h = ((child.position[0] - end_node.position[0]) ** 2) + (
-                    (child.position[1] - end_node.position[1]) ** 2
-                )
-                child.f = child.g + child.h
-                for open_node in open_list:
-                    if child == open_node and child.g > open_node.g:
-                        continue
-                open_list.append(child)
-        return None
-
-
-class Node:
-    """A node class for A* Pathfinding"""
-
-    def __init__(self, parent=None, position=None):
-        self.parent = parent
-        self.position = position
-        self.g = 0
-        self.h = 0
-        self.f = 0
-
-    def __eq__(self, other):
-        return self.position == other.position
+        return pathing.generate_path(
+            location,
+            target,
+            self.get_surrounding_tiles,
+            self.is_moveable_to,
+            self.search_nodes,
+            max_count=max_count,
+            heuristic=pathing.squared_distance,
+        )
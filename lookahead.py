@@ -0,0 +1,573 @@
+"""Opponent aware lookahead over a copy-on-write forward model of the arena"""
+import random
+
+import timing
+
+STAY = ""
+BOMB = "b"
+MOVES = {"u": (0, 1), "d": (0, -1), "l": (-1, 0), "r": (1, 0)}
+
+FUSE = 35
+SOFT_BLOCK_REWARD = 2
+ORE_BLOCK_REWARD = 10
+TREASURE_REWARD = 1
+HIT_REWARD = 25
+
+LOCATION, AMMO, HP, REWARD = range(4)  # Fields of a player tuple
+
+
+class ZobristKeys:
+    """A random 64 bit key for each thing a tile of an ArenaState can hold.
+
+    A state's hash is the xor of the keys of everything in it, so a step
+    updates it by xoring out what it removes and xoring in what it adds.
+    Bombs are keyed by ticks left rather than the tick they go off, and
+    rewards are left out, so the same position hashes the same on later
+    ticks. Counts past the top key share it.
+    """
+
+    MAX_ORE_HITS = 8
+    MAX_AMMO = 16
+    MAX_HP = 8
+
+    by_size = {}  # Tile count: keys, so every state of an arena shares them
+
+    def __init__(self, tile_count, seed=0):
+        rng = random.Random(seed)
+
+        def keys(count):
+            return [rng.getrandbits(64) for _ in range(count)]
+
+        self.soft = keys(tile_count)
+        self.ore = [keys(self.MAX_ORE_HITS + 1) for _ in range(tile_count)]
+        self.ammo = keys(tile_count)
+        self.treasure = keys(tile_count)
+        # Tile: owner (None, 0 or 1): ticks left
+        self.bomb = [[keys(FUSE + 1) for _ in range(3)] for _ in range(tile_count)]
+        self.location = [keys(tile_count) for _ in range(2)]
+        self.player_ammo = [keys(self.MAX_AMMO + 1) for _ in range(2)]
+        self.player_hp = [keys(self.MAX_HP + 1) for _ in range(2)]
+
+    @classmethod
+    def for_arena(cls, arena):
+        tile_count = arena.width * arena.height
+        if tile_count not in cls.by_size:
+            cls.by_size[tile_count] = cls(tile_count)
+        return cls.by_size[tile_count]
+
+
+class ArenaState:
+    """One tick of the arena, stepped forward by both players' actions.
+
+    Follows simulator.Game's rules without pickups spawning, and the agents'
+    rule that a blast stops short of an ore block two tiles away. A stepped
+    state shares everything with the state it came from until it changes it:
+    the masks and player tuples are immutable, and the bombs and ore_hits
+    dicts are copied on the first write, so a step costs about as much as
+    what it changes. hash is kept up to date through every change, see
+    ZobristKeys.
+    """
+
+    __slots__ = (
+        "arena",
+        "keys",
+        "hash",
+        "tick",
+        "solid",
+        "soft",
+        "ore",
+        "ore_hits",
+        "bombs",
+        "bomb_mask",
+        "ammo",
+        "treasure",
+        "players",
+        "owned",
+    )
+
+    def __init__(self, arena, tick, board, bombs, ore_hits, players):
+        """bombs maps location: (tick it goes off, owner id or None), and players
+        holds a (location, ammo, hp, reward) tuple for each player id
+        """
+        self.arena = arena
+        self.tick = tick
+        self.solid = board.indestructible_blocks
+        self.soft = board.soft_blocks
+        self.ore = board.ore_blocks
+        self.ore_hits = dict(ore_hits)
+        self.bombs = dict(bombs)
+        self.bomb_mask = board.mask(bombs)
+        self.ammo = board.ammo
+        self.treasure = board.treasure
+        self.players = tuple(players)
+        self.owned = True
+        self.keys = ZobristKeys.for_arena(arena)
+        self.hash = self.compute_hash()
+
+    def pack(self):
+        """Plain tuple of the state for sending to another process, see unpack"""
+        return (
+            (self.arena.width, self.arena.height),
+            self.tick,
+            self.solid,
+            self.soft,
+            self.ore,
+            self.ammo,
+            self.treasure,
+            tuple(self.bombs.items()),
+            tuple(self.ore_hits.items()),
+            self.players,
+        )
+
+    @classmethod
+    def unpack(cls, arena, packed):
+        """The state pack gave, on an Arena of the size packed[0]"""
+        state = object.__new__(cls)
+        state.arena = arena
+        (
+            _,
+            state.tick,
+            state.solid,
+            state.soft,
+            state.ore,
+            state.ammo,
+            state.treasure,
+            bombs,
+            ore_hits,
+            state.players,
+        ) = packed
+        state.bombs = dict(bombs)
+        state.ore_hits = dict(ore_hits)
+        state.bomb_mask = 0
+        for location in state.bombs:
+            state.bomb_mask |= state.bit(location)
+        state.owned = True
+        state.keys = ZobristKeys.for_arena(arena)
+        state.hash = state.compute_hash()
+        return state
+
+    def child(self):
+        state = object.__new__(ArenaState)
+        state.arena = self.arena
+        state.keys = self.keys
+        state.hash = self.hash
+        state.tick = self.tick
+        state.solid = self.solid
+        state.soft = self.soft
+        state.ore = self.ore
+        state.ore_hits = self.ore_hits
+        state.bombs = self.bombs
+        state.bomb_mask = self.bomb_mask
+        state.ammo = self.ammo
+        state.treasure = self.treasure
+        state.players = self.players
+        state.owned = False
+        return state
+
+    def own(self):
+        """Copies the dicts shared with the parent state, before writing to them"""
+        if not self.owned:
+            self.bombs = dict(self.bombs)
+            self.ore_hits = dict(self.ore_hits)
+            self.owned = True
+
+    def index(self, location):
+        return location[0] + location[1] * self.arena.width
+
+    def bit(self, location):
+        return 1 << (location[0] + location[1] * self.arena.width)
+
+    def compute_hash(self):
+        """The hash from scratch, which step keeps without recomputing it"""
+        value = 0
+        for index in range(self.arena.width * self.arena.height):
+            bit = 1 << index
+            if self.soft & bit:
+                value ^= self.keys.soft[index]
+            if self.ammo & bit:
+                value ^= self.keys.ammo[index]
+            if self.treasure & bit:
+                value ^= self.keys.treasure[index]
+            if self.ore & bit:
+                location = divmod(index, self.arena.width)[::-1]
+                value ^= self.ore_key(location, self.ore_hits.get(location, 1))
+        for location, bomb in self.bombs.items():
+            value ^= self.bomb_key(location, bomb)
+        for pid, player in enumerate(self.players):
+            value ^= self.player_key(pid, player)
+        return value
+
+    def ore_key(self, location, hits):
+        hits = min(max(hits, 0), ZobristKeys.MAX_ORE_HITS)
+        return self.keys.ore[self.index(location)][hits]
+
+    def bomb_key(self, location, bomb):
+        tick, owner = bomb
+        left = min(max(tick - self.tick, 0), FUSE)  # Overdue goes off next step too
+        owner = 0 if owner is None else owner + 1
+        return self.keys.bomb[self.index(location)][owner][left]
+
+    def player_key(self, pid, player):
+        location, ammo, hp, _ = player
+        return (
+            self.keys.location[pid][self.index(location)]
+            ^ self.keys.player_ammo[pid][min(ammo, ZobristKeys.MAX_AMMO)]
+            ^ self.keys.player_hp[pid][min(max(hp, 0), ZobristKeys.MAX_HP)]
+        )
+
+    def is_blocked(self, location):
+        bit = self.bit(location)
+        return bool((self.solid | self.soft | self.ore | self.bomb_mask) & bit)
+
+    def is_over(self):
+        return any(player[HP] <= 0 for player in self.players)
+
+    def get_actions(self, pid):
+        """Actions of player pid that don't just repeat standing still"""
+        location, ammo, _, _ = self.players[pid]
+        others = [player[LOCATION] for player in self.players]
+        actions = [STAY]
+        for action, (dx, dy) in MOVES.items():
+            target = (location[0] + dx, location[1] + dy)
+            if (
+                self.arena.is_in_bounds(target)
+                and not self.is_blocked(target)
+                and target not in others
+            ):
+                actions.append(action)
+        if ammo > 0 and location not in self.bombs:
+            actions.append(BOMB)
+        return actions
+
+    def step(self, actions):
+        """State a tick later, after each player id takes actions[id]"""
+        state = self.child()
+        players = list(self.players)
+        for pid, action in enumerate(actions):
+            location, ammo, hp, reward = players[pid]
+            if action == BOMB:
+                if ammo > 0 and location not in state.bombs:
+                    state.own()
+                    bomb = (state.tick + FUSE, pid)
+                    state.bombs[location] = bomb
+                    state.bomb_mask |= state.bit(location)
+                    state.hash ^= state.bomb_key(location, bomb)
+                    players[pid] = (location, ammo - 1, hp, reward)
+            elif action in MOVES:
+                dx, dy = MOVES[action]
+                target = (location[0] + dx, location[1] + dy)
+                if (
+                    state.arena.is_in_bounds(target)
+                    and not state.is_blocked(target)
+                    and all(other[LOCATION] != target for other in players)
+                ):
+                    players[pid] = (target, ammo, hp, reward)
+
+        for pid, (location, ammo, hp, reward) in enumerate(players):
+            bit = state.bit(location)
+            if state.ammo & bit:
+                state.ammo &= ~bit
+                state.hash ^= state.keys.ammo[state.index(location)]
+                players[pid] = (location, ammo + 1, hp, reward)
+            elif state.treasure & bit:
+                state.treasure &= ~bit
+                state.hash ^= state.keys.treasure[state.index(location)]
+                players[pid] = (location, ammo, hp, reward + TREASURE_REWARD)
+
+        due = [bomb for bomb, (tick, _) in state.bombs.items() if tick <= state.tick]
+        if due:
+            state.own()
+            hit = set()
+            for location in due:
+                if location in state.bombs:  # May have gone off in a chain already
+                    state.detonate(location, players, hit)
+        for pid, player in enumerate(players):
+            if player != self.players[pid]:
+                state.hash ^= state.player_key(pid, self.players[pid])
+                state.hash ^= state.player_key(pid, player)
+        state.players = tuple(players)
+
+        for location, bomb in state.bombs.items():  # One tick less left on each
+            state.hash ^= state.bomb_key(location, bomb)
+        state.tick += 1
+        for location, bomb in state.bombs.items():
+            state.hash ^= state.bomb_key(location, bomb)
+        return state
+
+    def get_blast(self, location):
+        blast = [location]
+        blocked = self.solid | self.soft | self.ore | self.bomb_mask
+        for ray in self.arena.blast_rays[location]:
+            for distance, tile in enumerate(ray, 1):
+                bit = self.bit(tile)
+                if distance > 1 and self.ore & bit:
+                    break
+                blast.append(tile)
+                if blocked & bit:
+                    break
+        return blast
+
+    def detonate(self, location, players, hit):
+        bomb = self.bombs.pop(location)
+        owner = bomb[1]
+        self.bomb_mask &= ~self.bit(location)
+        self.hash ^= self.bomb_key(location, bomb)
+        for tile in self.get_blast(location):
+            bit = self.bit(tile)
+            index = self.index(tile)
+            if self.soft & bit:
+                self.soft &= ~bit
+                self.hash ^= self.keys.soft[index]
+                self.add_reward(players, owner, SOFT_BLOCK_REWARD)
+            elif self.ore & bit:
+                hits = self.ore_hits.get(tile, 1)
+                self.hash ^= self.ore_key(tile, hits)
+                if hits <= 1:
+                    self.ore &= ~bit
+                    self.ore_hits.pop(tile, None)
+                    self.add_reward(players, owner, ORE_BLOCK_REWARD)
+                else:
+                    self.ore_hits[tile] = hits - 1
+                    self.hash ^= self.ore_key(tile, hits - 1)
+            elif tile in self.bombs:
+                self.detonate(tile, players, hit)
+            if self.ammo & bit:
+                self.ammo &= ~bit
+                self.hash ^= self.keys.ammo[index]
+            if self.treasure & bit:
+                self.treasure &= ~bit
+                self.hash ^= self.keys.treasure[index]
+            for pid, (player_location, ammo, hp, reward) in enumerate(players):
+                if player_location == tile and pid not in hit:
+                    hit.add(pid)
+                    players[pid] = (player_location, ammo, hp - 1, reward)
+                    if owner is not None and pid != owner:
+                        self.add_reward(players, owner, HIT_REWARD)
+
+    def add_reward(self, players, pid, amount):
+        if pid is not None:
+            location, ammo, hp, reward = players[pid]
+            players[pid] = (location, ammo, hp, reward + amount)
+
+    def reaches(self, bomb, location):
+        """Whether the blast of the bomb at bomb would cover location now"""
+        dx, dy = location[0] - bomb[0], location[1] - bomb[1]
+        if dx and dy:
+            return False
+        distance = abs(dx + dy)
+        if distance == 0:
+            return True
+        if distance > self.arena.BLAST_RADIUS:
+            return False
+        if distance == 2:
+            if self.ore & self.bit(location):
+                return False
+            middle = (bomb[0] + dx // 2, bomb[1] + dy // 2)
+            if self.is_blocked(middle):
+                return False
+        return True
+
+
+class TranspositionTable:
+    """Search results in a fixed number of slots, picked by the low hash bits.
+
+    A slot holds one entry and keeps the full hash to tell collisions apart.
+    A new result takes the slot over unless the entry there came from the
+    current search and was searched deeper, so entries left by earlier
+    ticks give way first but still answer lookups until they do.
+    """
+
+    def __init__(self, size_bits=16):
+        self.mask = (1 << size_bits) - 1
+        self.slots = [None] * (1 << size_bits)
+        self.generation = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def get(self, key):
+        """(depth, value, flag, action) stored for key, or None"""
+        entry = self.slots[key & self.mask]
+        if entry is None or entry[0] != key:
+            return None
+        self.hits += 1
+        return entry[1:5]
+
+    def put(self, key, depth, value, flag, action):
+        index = key & self.mask
+        entry = self.slots[index]
+        if (
+            entry is not None
+            and entry[0] != key
+            and entry[5] == self.generation
+            and entry[1] > depth
+        ):
+            return
+        self.slots[index] = (key, depth, value, flag, action, self.generation)
+        self.stores += 1
+
+
+class Lookahead:
+    """Depth limited search over both players' actions on an ArenaState.
+
+    The opponent either answers each of our actions as an adversary (minimax
+    with alpha-beta pruning) or, with adversarial False, picks uniformly at
+    random (expectimax). Iterative deepening keeps the best action of the
+    deepest finished search when the deadline runs out, and a transposition
+    table shares values between move orders reaching the same state and
+    orders moves by the previous depth's best. The table is kept from one
+    choose to the next, storing values less the reward difference already
+    banked, so the positions a tick ago's search looked at are reused.
+    """
+
+    WIN = 1000
+    THREAT_TICKS = 3  # A blast this close to going off counts against a player
+    THREAT_WEIGHT = 0.5
+
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+    def __init__(self, player, adversarial=True, max_depth=8, table_bits=16):
+        self.player = player
+        self.opponent = 1 - player
+        self.adversarial = adversarial
+        self.max_depth = max_depth
+        self.table = TranspositionTable(table_bits)
+        self.deadline = None
+        self.nodes = 0
+        self.depth = 0  # Deepest search the last choose finished
+        self.values = {}  # Our action: value, from the last choose
+
+    def choose(self, state, deadline, preferred=None):
+        """Best action for our player, or None if not even depth 1 finished.
+
+        values then holds the value of each of our actions at the deepest
+        finished depth, exact for the best one and an upper bound for the
+        rest. preferred is searched first and wins ties.
+        """
+        self.table.new_search()
+        self.deadline = deadline
+        self.nodes = 0
+        self.depth = 0
+        self.values = {}
+        for depth in range(1, self.max_depth + 1):
+            try:
+                values = self.search_root(state, depth, preferred)
+            except timing.OutOfTime:
+                break
+            self.values = values
+            self.depth = depth
+        if not self.values:
+            return None
+        return max(
+            self.values, key=lambda action: (self.values[action], action == preferred)
+        )
+
+    def search_root(self, state, depth, preferred):
+        self.nodes += 1
+        actions = state.get_actions(self.player)
+        previous_best = max(self.values, key=self.values.get, default=None)
+        for action in (previous_best, preferred):  # So preferred's value is exact
+            if action in actions:
+                actions.remove(action)
+                actions.insert(0, action)
+        values = {}
+        alpha = -float("inf")
+        for action in actions:
+            value = self.opponent_value(state, action, depth, alpha, float("inf"))
+            values[action] = value
+            alpha = max(alpha, value)
+        return values
+
+    def max_value(self, state, depth, alpha, beta):
+        """(value, action) of our best action at state, searched depth ticks"""
+        self.deadline.check()
+        self.nodes += 1
+        if depth == 0 or state.is_over():
+            return self.evaluate(state), None
+
+        players = state.players
+        banked = players[self.player][REWARD] - players[self.opponent][REWARD]
+        entry = self.table.get(state.hash)
+        hint = None
+        if entry is not None:
+            entry_depth, value, flag, hint = entry
+            value += banked
+            if entry_depth >= depth:
+                if flag == self.EXACT:
+                    return value, hint
+                if flag == self.LOWER and value >= beta:
+                    return value, hint
+                if flag == self.UPPER and value <= alpha:
+                    return value, hint
+
+        actions = state.get_actions(self.player)
+        if hint in actions:
+            actions.remove(hint)
+            actions.insert(0, hint)
+        original_alpha = alpha
+        best_value, best_action = -float("inf"), None
+        for action in actions:
+            value = self.opponent_value(state, action, depth, alpha, beta)
+            if value > best_value:
+                best_value, best_action = value, action
+            alpha = max(alpha, best_value)
+            if alpha >= beta:
+                break
+
+        if best_value <= original_alpha:
+            flag = self.UPPER
+        elif best_value >= beta:
+            flag = self.LOWER
+        else:
+            flag = self.EXACT
+        self.table.put(state.hash, depth, best_value - banked, flag, best_action)
+        return best_value, best_action
+
+    def opponent_value(self, state, action, depth, alpha, beta):
+        """Value of our action once the opponent has answered it"""
+        joint = [None, None]
+        joint[self.player] = action
+        responses = state.get_actions(self.opponent)
+        if not self.adversarial:
+            total = 0
+            for response in responses:
+                joint[self.opponent] = response
+                value, _ = self.max_value(
+                    state.step(joint), depth - 1, -float("inf"), float("inf")
+                )
+                total += value
+            return total / len(responses)
+
+        worst = float("inf")
+        for response in responses:
+            joint[self.opponent] = response
+            value, _ = self.max_value(state.step(joint), depth - 1, alpha, beta)
+            worst = min(worst, value)
+            beta = min(beta, worst)
+            if alpha >= beta:
+                break
+        return worst
+
+    def evaluate(self, state):
+        me = state.players[self.player]
+        opponent = state.players[self.opponent]
+        value = me[REWARD] - opponent[REWARD]
+        value += HIT_REWARD * (me[HP] - opponent[HP])
+        if state.is_over():
+            if (me[HP] > 0) != (opponent[HP] > 0):
+                return value + (self.WIN if me[HP] > 0 else -self.WIN)
+            return value
+        value -= self.threat(state, me[LOCATION])
+        value += self.threat(state, opponent[LOCATION])
+        return value
+
+    def threat(self, state, location):
+        """Share of a hit a player risks from blasts about to go off on it"""
+        for bomb, (tick, _) in state.bombs.items():
+            if tick - state.tick < self.THREAT_TICKS and state.reaches(bomb, location):
+                return HIT_REWARD * self.THREAT_WEIGHT
+        return 0
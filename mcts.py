@@ -0,0 +1,366 @@
+"""Monte Carlo tree search over the lookahead forward model of the arena"""
+import atexit
+import math
+import random
+
+from board import Arena
+import lookahead
+import snapshot
+import timing
+import workers
+
+arenas = {}  # Per worker process cache of Arena by size
+boards = {}  # Per worker process cache of snapshot.SharedBoard by name
+parallel = {}  # (processes, size): (WorkerPool, SharedBoard) of this process
+
+
+def get_parallel(processes, size):
+    """The worker pool and board every RootParallelSearch here shares.
+
+    Made on first use and kept until exit, so games played one after
+    another in a process reuse the same workers and shared memory.
+    """
+    key = (processes, size)
+    if key not in parallel:
+        if not parallel:
+            atexit.register(close_parallel)
+        # Board first, so the workers share our resource tracker and leave it be
+        board = snapshot.SharedBoard(size)
+        parallel[key] = (workers.WorkerPool(processes), board)
+    return parallel[key]
+
+
+def close_parallel():
+    while parallel:
+        _, (pool, board) = parallel.popitem()
+        pool.close()
+        board.close()
+
+
+class RolloutPolicy:
+    """Samples either player's actions from a value per tile.
+
+    values holds what planting a bomb on a tile is worth, as the agents'
+    bombing_value scores it, and is spread over the walkable tiles so a
+    move towards a good tile is worth nearly as much as the tile itself.
+    A bomb is weighted by the value of the tile it goes on, and stepping
+    into a blast about to go off is all but ruled out.
+    """
+
+    MOVE_WEIGHT = 1
+    BOMB_WEIGHT = 0.1
+    VALUE_WEIGHT = 2
+    DECAY = 0.7  # Share of a tile's value its neighbours get
+    DANGER_TICKS = 2
+    DANGER_WEIGHT = 0.02
+
+    def __init__(self, arena, values, walkable, rng=random):
+        self.arena = arena
+        self.values = values
+        self.rng = rng
+        self.field = self.spread(values, walkable)
+
+    def spread(self, values, walkable):
+        field = {tile: values.get(tile, 0) for tile in walkable}
+        changed = True
+        while changed:
+            changed = False
+            for tile in field:
+                best = max(
+                    (field.get(other, 0) for other in self.arena.neighbours[tile]),
+                    default=0,
+                )
+                if best * self.DECAY > field[tile]:
+                    field[tile] = best * self.DECAY
+                    changed = True
+        return field
+
+    def weights(self, state, pid):
+        """(actions, weights) of player pid at state"""
+        location = state.players[pid][lookahead.LOCATION]
+        actions = state.get_actions(pid)
+        due = [
+            bomb
+            for bomb, (tick, _) in state.bombs.items()
+            if tick - state.tick <= self.DANGER_TICKS
+        ]
+        weights = []
+        for action in actions:
+            if action == lookahead.BOMB:
+                weights.append(
+                    self.BOMB_WEIGHT + self.VALUE_WEIGHT * self.values.get(location, 0)
+                )
+                continue
+            dx, dy = lookahead.MOVES.get(action, (0, 0))
+            target = (location[0] + dx, location[1] + dy)
+            weight = self.MOVE_WEIGHT + self.VALUE_WEIGHT * self.field.get(target, 0)
+            if any(state.reaches(bomb, target) for bomb in due):
+                weight *= self.DANGER_WEIGHT
+            weights.append(weight)
+        return actions, weights
+
+    def pack(self):
+        """(values, walkable) to rebuild the policy in another process"""
+        return self.values, tuple(self.field)
+
+    def sample(self, state, pid):
+        actions, weights = self.weights(state, pid)
+        return self.rng.choices(actions, weights)[0]
+
+
+class Node:
+    """A state in the tree, with separate action statistics for each player"""
+
+    __slots__ = ("state", "visits", "children", "priors", "stats")
+
+    def __init__(self, state, policy):
+        self.state = state
+        self.visits = 0
+        self.children = {}  # Joint action: Node
+        self.priors = []  # Per player id, action: share of the policy's weight
+        self.stats = []  # Per player id, action: [visits, total value]
+        for pid in range(len(state.players)):
+            actions, weights = policy.weights(state, pid)
+            total = sum(weights)
+            self.priors.append(
+                {action: weight / total for action, weight in zip(actions, weights)}
+            )
+            self.stats.append({action: [0, 0.0] for action in actions})
+
+
+class TreeSearch:
+    """Decoupled UCT over both players' simultaneous actions.
+
+    At each node each player picks its own action by UCB1 over its own
+    statistics, with the rollout policy's weights as a prior bonus that
+    fades as an action is visited, and the pair selects the child. New
+    leaves are valued by a rollout of ROLLOUT_TICKS ticks on the policy,
+    scored from our side and squashed into (-1, 1). Where we end up counts
+    by the policy's spread values, so heading for a target shows before it
+    pays. Searching runs until the deadline, so a longer move budget buys
+    more simulations.
+    """
+
+    EXPLORATION = 1.0
+    PRIOR_WEIGHT = 1.0
+    PREFERRED_PRIOR = 0.5  # Extra prior for the move the heuristics chose
+    ROLLOUT_TICKS = 12
+    PENDING_WEIGHT = 0.8  # Credit for what a bomb of ours is yet to destroy
+    POSITION_WEIGHT = 0.5  # Credit for the policy's value of our tile
+    WIN = 1000
+
+    def __init__(self, player, rng=random):
+        self.player = player
+        self.opponent = 1 - player
+        self.rng = rng
+        self.policy = None
+        self.baseline = 0
+        self.simulations = 0
+        self.visits = {}  # Our action: visits at the root, from the last search
+        self.values = {}  # Our action: mean value at the root, from the last search
+
+    def search(self, state, policy, deadline, preferred=None):
+        """Our most visited action, or None if no simulation finished"""
+        self.policy = policy
+        self.baseline = self.score(state)
+        self.simulations = 0
+        root = Node(state, policy)
+        priors = root.priors[self.player]
+        if preferred in priors:
+            priors[preferred] += self.PREFERRED_PRIOR
+        try:
+            while True:
+                deadline.check()
+                self.simulate(root)
+                self.simulations += 1
+        except timing.OutOfTime:
+            pass
+        stats = root.stats[self.player]
+        self.visits = {action: visits for action, (visits, _) in stats.items()}
+        self.values = {
+            action: total / visits
+            for action, (visits, total) in stats.items()
+            if visits
+        }
+        if not self.simulations:
+            return None
+        return max(stats, key=lambda action: (stats[action][0], action == preferred))
+
+    def simulate(self, root):
+        node = root
+        path = []
+        while True:
+            if node.state.is_over():
+                value = self.evaluate(node.state)
+                break
+            joint = [None, None]
+            joint[self.player] = self.select(node, self.player, 1)
+            joint[self.opponent] = self.select(node, self.opponent, -1)
+            joint = tuple(joint)
+            path.append((node, joint))
+            child = node.children.get(joint)
+            if child is None:
+                child = Node(node.state.step(joint), self.policy)
+                node.children[joint] = child
+                value = self.rollout(child.state)
+                break
+            node = child
+
+        for node, joint in path:
+            node.visits += 1
+            for pid, action in enumerate(joint):
+                stats = node.stats[pid][action]
+                stats[0] += 1
+                stats[1] += value
+
+    def select(self, node, pid, sign):
+        """UCB1 pick for player pid, whose values are sign times ours"""
+        log_visits = math.log(node.visits + 1)
+        priors = node.priors[pid]
+        best, best_score = None, -float("inf")
+        for action, (visits, total) in node.stats[pid].items():
+            prior = priors[action]
+            if visits == 0:
+                score = 1e9 + prior  # Unvisited first, likeliest first
+            else:
+                score = (
+                    sign * total / visits
+                    + self.EXPLORATION * math.sqrt(log_visits / visits)
+                    + self.PRIOR_WEIGHT * prior / (1 + visits)
+                )
+            if score > best_score:
+                best, best_score = action, score
+        return best
+
+    def rollout(self, state):
+        for _ in range(self.ROLLOUT_TICKS):
+            if state.is_over():
+                break
+            state = state.step(
+                [self.policy.sample(state, pid) for pid in range(len(state.players))]
+            )
+        return self.evaluate(state)
+
+    def evaluate(self, state):
+        return math.tanh((self.score(state) - self.baseline) / lookahead.HIT_REWARD)
+
+    def score(self, state):
+        """Our lead in reward and hp, counting what our bombs will destroy"""
+        me = state.players[self.player]
+        opponent = state.players[self.opponent]
+        value = me[lookahead.REWARD] - opponent[lookahead.REWARD]
+        value += lookahead.HIT_REWARD * (me[lookahead.HP] - opponent[lookahead.HP])
+        if state.is_over():
+            if (me[lookahead.HP] > 0) != (opponent[lookahead.HP] > 0):
+                value += self.WIN if me[lookahead.HP] > 0 else -self.WIN
+            return value
+        value += self.PENDING_WEIGHT * (
+            self.pending(state, self.player) - self.pending(state, self.opponent)
+        )
+        return value + self.POSITION_WEIGHT * self.policy.field.get(
+            me[lookahead.LOCATION], 0
+        )
+
+    def pending(self, state, pid):
+        reward = 0
+        for location, (_, owner) in state.bombs.items():
+            if owner != pid:
+                continue
+            for tile in state.get_blast(location):
+                bit = state.bit(tile)
+                if state.soft & bit:
+                    reward += lookahead.SOFT_BLOCK_REWARD
+                elif state.ore & bit and state.ore_hits.get(tile, 1) <= 1:
+                    reward += lookahead.ORE_BLOCK_REWARD
+        return reward
+
+
+def search_shared(name, sequence, packed_policy, player, budget, preferred, seed):
+    """(simulations, {action: (visits, total value)}) of a TreeSearch run in a
+    worker process from the SharedBoard called name, or None if the board has
+    moved on from sequence or couldn't be read
+    """
+    if name not in boards:
+        boards[name] = snapshot.SharedBoard(name=name)
+    read = boards[name].read()
+    if read is None or read[0] != sequence:
+        return None
+    packed_state = read[1]
+    size = packed_state[0]
+    if size not in arenas:
+        arenas[size] = Arena(size)
+    arena = arenas[size]
+    rng = random.Random(seed)
+    values, walkable = packed_policy
+    policy = RolloutPolicy(arena, values, walkable, rng)
+    search = TreeSearch(player, rng)
+    state = lookahead.ArenaState.unpack(arena, packed_state)
+    search.search(state, policy, timing.Deadline(budget), preferred)
+    stats = {
+        action: (visits, visits * search.values.get(action, 0))
+        for action, visits in search.visits.items()
+    }
+    return search.simulations, stats
+
+
+class RootParallelSearch:
+    """TreeSearch from the same root in several worker processes at once.
+
+    Each worker grows a tree of its own, with its own dice, until just
+    before the deadline, and the root visit counts and values are summed
+    before picking the most visited action. The workers sidestep the GIL,
+    so the merged counts are worth about as much as that many processes'
+    worth of simulations in one tree. Each search writes the root state to
+    a snapshot.SharedBoard and the workers read it from there, so only the
+    rollout policy's values travel with the calls. The pool and board are
+    get_parallel's, shared by every search in the process.
+    """
+
+    MERGE_TIME = 0.005  # Seconds kept back for the results to come home
+
+    def __init__(self, player, processes, rng=random):
+        self.player = player
+        self.processes = processes
+        self.rng = rng
+        self.pool = None
+        self.board = None
+        self.simulations = 0
+        self.visits = {}  # Our action: visits at the root, summed over workers
+        self.values = {}  # Our action: mean value at the root, over workers
+
+    def search(self, state, policy, deadline, preferred=None):
+        """Our most visited action over all workers, or None if none finished"""
+        if self.pool is None:
+            size = (state.arena.width, state.arena.height)
+            self.pool, self.board = get_parallel(self.processes, size)
+        self.simulations = 0
+        self.visits = {}
+        self.values = {}
+        budget = deadline.remaining() - self.MERGE_TIME
+        if budget <= 0:
+            return None
+        self.board.write(state.pack())
+        args = (self.board.name, self.board.sequence, policy.pack(), self.player)
+        calls = [
+            (search_shared, args + (budget, preferred, self.rng.getrandbits(32)))
+            for _ in range(len(self.pool))
+        ]
+        totals = {}
+        for result in self.pool.run(calls, deadline):
+            if result is None:
+                continue
+            simulations, stats = result
+            self.simulations += simulations
+            for action, (visits, total) in stats.items():
+                self.visits[action] = self.visits.get(action, 0) + visits
+                totals[action] = totals.get(action, 0) + total
+        self.values = {
+            action: totals[action] / visits
+            for action, visits in self.visits.items()
+            if visits
+        }
+        if not self.simulations:
+            return None
+        return max(
+            self.visits, key=lambda action: (self.visits[action], action == preferred)
+        )
@@ -1,9 +1,11 @@
 """File for primary agent"""
-import random
-
 from coderone.dungeon.agent import PlayerState, GameState
 import cProfile
 
+from board import Board
+import pathing
+import scoring
+
 
 class Agent:
     """Class for primary agent"""
@@ -36,6 +38,8 @@ class Agent:
     def __init__(self):
         self.tick_number = 0
         self.bombs = {}
+        self.search_nodes = None
+        self.danger = None
         self.first = True
         self.target = None
         self.path = []
@@ -58,6 +62,7 @@ class Agent:
     def next_move(self, game_state: GameState, player_state: PlayerState):
         """This method is called each time the player needs to choose an action"""
         self.game_state = game_state
+        self.board = Board(game_state, player_state)
         self.player_state = player_state
 
         if self.first:
@@ -70,6 +75,7 @@ class Agent:
             self.synced = True
 
         self.track_bombs(game_state.bombs)
+        self.danger = scoring.DangerMap.from_game_state(game_state, self.bombs)
 
         if self.synced and self.player_location != player_state.location:
             last_move = self.move_history[-1]
@@ -138,13 +144,11 @@ class Agent:
         return move
 
     def is_moveable_to(self, location):
-        if self.game_state.is_in_bounds(location):
-            entity = self.game_state.entity_at(location)
-            return entity not in self.IMPENETRABLE_OBJECTS and entity != self.enemy_id
-        return False
+        return self.board.is_moveable_to(location)
 
     def on_first(self):
         self.first = False
+        self.search_nodes = pathing.SearchNodes(*self.game_state.size)
         self.player_location = self.player_state.location
         self.enemy_id = int(self.player_state.id == 0)
         self.ores = {ore: 3 for ore in self.game_state.ore_blocks}
@@ -221,7 +225,7 @@ class Agent:
                             coords = (loc[0], new_value)
                         else:
                             continue
-                    entity = self.game_state.entity_at(coords)
+                    entity = self.board.entity_at(coords)
                     if distance > 1 and entity == "ob":
                         break
                     affected.append(coords)
@@ -230,21 +234,15 @@ class Agent:
         return affected
 
     def in_bomb_radius(self, location, time_remaining=None):
-        if time_remaining is not None:
-            detonation_tick = self.tick_number + time_remaining - 35
-        if location in self.bombs:
-            if time_remaining is None or self.bombs[location] <= detonation_tick:
-                return True
-        for bomb in self.bombs:
-            if location in self.bomb_affect(bomb):
-                if time_remaining is None or self.bombs[bomb] <= detonation_tick:
-                    return True
-        return False
+        detonation_tick = self.danger.get(location)
+        if time_remaining is None:
+            return detonation_tick != scoring.NO_DANGER
+        return detonation_tick <= self.tick_number + time_remaining
 
     def bombing_value(self, loc, inculde_pickups=True):
         points = 0
 
-        entity = self.game_state.entity_at(loc)
+        entity = self.board.entity_at(loc)
         if inculde_pickups:
             if entity == "t":
                 points += 1
@@ -261,7 +259,7 @@ class Agent:
                     diff = tuple((x - y) * -1 for x, y in zip(loc, location))
                     if (loc[0] + diff[0], loc[1] + diff[1]) in self.bombs:
                         continue
-                entity = self.game_state.entity_at(location)
+                entity = self.board.entity_at(location)
                 if entity == "ob" and (
                     (
                         self.game_stage == self.MIDDLE
@@ -290,7 +288,7 @@ class Agent:
         if move == self.DOWN:
             return self.is_moveable_to((position[0], position[1] - 1))
         if move == self.BOMB:
-            if self.game_state.entity_at(position) == self.player_state.id:
+            if self.board.entity_at(position) == self.player_state.id:
                 return True
             else:
                 return False
@@ -426,63 +424,12 @@ class Agent:
         return self.DO_NOTHING
 
     def generate_path(self, location, target, max_count=200):
-        start_node = Node(None, location)
-        start_node.g = start_node.h = start_node.f = 0
-        end_node = Node(None, target)
-        end_node.g = end_node.h = end_node.f = 0
-        open_list = []
-        closed_list = set()
-        open_list.append(start_node)
-        iter_count = 0
-        while iter_count < max_count and len(open_list) > 0:
-            iter_count += 1
-            current_node = min(open_list, key=lambda x: x.f)
-            open_list.remove(current_node)
-            closed_list.add(current_node)
-
-            if current_node == end_node:
-                path = []
-                current = current_node
-                while current is not None:
-                    path.append(current.position)
-                    current = current.parent
-                path.pop()
-                return path
-
-            tiles = self.get_surrounding_tiles(current_node.position)
-            random.shuffle(tiles)
-            for tile in tiles:
-                if self.is_moveable_to(tile):
-                    node = Node(None, tile)
-                    if node not in closed_list:
-                        node.parent = current_node
-                        node.g = current_node.g + 1
-                        node.h = (
-                            self.get_manhattan_distance(
-                                node.position, end_node.position
-                            )
-                            * self.PATHFINDER_HEURISTIC
-                        )
-                        node.f = node.g + node.h
-                        for open_node in open_list:
-                            if node == open_node and node.g > open_node.g:
-                                continue
-                        open_list.append(node)
-        return None
-
-
-class Node:
-    """A node class for A* Pathfinding"""
-
-    def __init__(self, parent=None, position=None):
-        self.parent = parent
-        self.position = position
-        self.g = 0
-        self.h = 0
-        self.f = 0
-
-    def __eq__(self, other):
-        return self.position == other.position
-
-    def __hash__(self):
-        return hash(self.position)
+        return pathing.generate_path(
+            location,
+            target,
+            self.get_surrounding_tiles,
+            self.is_moveable_to,
+            self.search_nodes,
+            max_count=max_count,
+            heuristic_weight=self.PATHFINDER_HEURISTIC,
+        )
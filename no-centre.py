@@ -1,9 +1,11 @@
 """File for primary agent"""
-import random
-
 from coderone.dungeon.agent import PlayerState, GameState
 import cProfile
 
+from board import Board
+import pathing
+import scoring
+
 
 class Agent:
     """Class for primary agent"""
@@ -34,6 +36,8 @@ class Agent:
     def __init__(self):
         self.tick_number = 0
         self.bombs = {}
+        self.search_nodes = None
+        self.danger = None
         self.first = True
         self.target = None
         self.path = []
@@ -48,7 +52,6 @@ class Agent:
         self.y_bound = 9
         self.enemy_id = -1
         self.attack_enemy = False
-        self.bomb_map = {}
 
     # def next_move(self, game_state, player_state):
     #     cProfile.runctx('self.next_move_alt(g, p)', {'g': game_state, 'p': player_state, 'self': self}, {}, 'out.pstat')
@@ -57,6 +60,7 @@ class Agent:
     def next_move(self, game_state: GameState, player_state: PlayerState):
         """This method is called each time the player needs to choose an action"""
         self.game_state = game_state
+        self.board = Board(game_state, player_state)
         self.player_state = player_state
 
         if self.first:
@@ -138,8 +142,8 @@ class Agent:
         return move
 
     def is_moveable_to(self, location, skip_enemy=False):
-        if self.game_state.is_in_bounds(location):
-            entity = self.game_state.entity_at(location)
+        if self.board.is_in_bounds(location):
+            entity = self.board.entity_at(location)
             return entity not in self.IMPENETRABLE_OBJECTS and (
                 skip_enemy or entity != self.enemy_id
             )
@@ -147,6 +151,7 @@ class Agent:
 
     def on_first(self):
         self.first = False
+        self.search_nodes = pathing.SearchNodes(*self.game_state.size)
         self.player_location = self.player_state.location
         self.enemy_id = int(self.player_state.id == 0)
         self.ores = {ore: 3 for ore in self.game_state.ore_blocks}
@@ -206,19 +211,10 @@ class Agent:
                 self.bombs[location] = self.bombs[tile] + 1
 
     def create_bomb_map(self):
-        bomb_map = {}
-        for bomb in self.bombs:
-            if bomb not in bomb_map or bomb_map[bomb] > self.bombs[bomb] + 35:
-                bomb_map[bomb] = self.bombs[bomb] + 35
-            for tile in self.bomb_affect(bomb):
-                if tile not in bomb_map or bomb_map[tile] > self.bombs[bomb] + 35:
-                    bomb_map[tile] = self.bombs[bomb] + 35
-        self.bomb_map = bomb_map
+        self.danger = scoring.DangerMap.from_game_state(self.game_state, self.bombs)
 
     def is_safe(self, location, tick, late_game=False):
-        if location not in self.bomb_map:
-            return True
-        det_tick = self.bomb_map[location]
+        det_tick = self.danger.get(location)
         if late_game:
             if det_tick < tick + 5:
                 return False
@@ -252,7 +248,7 @@ class Agent:
                             coords = (loc[0], new_value)
                         else:
                             continue
-                    entity = self.game_state.entity_at(coords)
+                    entity = self.board.entity_at(coords)
                     if distance > 1 and entity == "ob":
                         break
                     affected.append(coords)
@@ -263,7 +259,7 @@ class Agent:
     def bombing_value(self, loc, inculde_pickups=True):
         points = 0
 
-        entity = self.game_state.entity_at(loc)
+        entity = self.board.entity_at(loc)
         if inculde_pickups:
             if entity == "t":
                 points += 1
@@ -280,7 +276,7 @@ class Agent:
                     diff = tuple((x - y) * -1 for x, y in zip(loc, location))
                     if (loc[0] + diff[0], loc[1] + diff[1]) in self.bombs:
                         continue
-                entity = self.game_state.entity_at(location)
+                entity = self.board.entity_at(location)
                 if entity == "ob" and (
                     (
                         self.game_stage == self.MIDDLE
@@ -291,7 +287,7 @@ class Agent:
                     points += 10 / self.ores[location]
                 elif entity == self.enemy_id and self.attack_enemy:
                     points += 0.5
-                elif location in self.bomb_map:
+                elif self.danger.get(location) != scoring.NO_DANGER:
                     continue
                 elif entity == "sb":
                     points += 2
@@ -309,7 +305,7 @@ class Agent:
         if move == self.DOWN:
             return self.is_moveable_to((position[0], position[1] - 1))
         if move == self.BOMB:
-            if self.game_state.entity_at(position) == self.player_state.id:
+            if self.board.entity_at(position) == self.player_state.id:
                 return True
             else:
                 return False
@@ -419,7 +415,7 @@ class Agent:
             if not self.is_safe(target, self.tick_number + 1):
                 print("Avoiding Bomb, Waiting one turn")
                 return self.DO_NOTHING
-            if self.game_state.entity_at(self.player_location) == self.BOMB:
+            if self.board.entity_at(self.player_location) == self.BOMB:
                 trap, exit = self.get_trap_details(target)
                 if trap is not None and exit is None:
                     print("Avoiding Trap, Waiting one turn")
@@ -480,7 +476,7 @@ class Agent:
         return trap, exit
 
     def avoid_bombs_and_traps(self):
-        if self.player_location not in self.bomb_map:
+        if self.danger.get(self.player_location) == scoring.NO_DANGER:
             _, exit = self.get_trap_details(self.player_location)
             if exit is None:
                 return None
@@ -532,60 +528,12 @@ class Agent:
             return None
 
     def generate_path(self, location, target, max_count=200, skip_enemy=True):
-        start_node = Node(None, location)
-        start_node.g = start_node.h = start_node.f = 0
-        end_node = Node(None, target)
-        end_node.g = end_node.h = end_node.f = 0
-        open_list = []
-        closed_list = set()
-        open_list.append(start_node)
-        iter_count = 0
-        while iter_count < max_count and len(open_list) > 0:
-            iter_count += 1
-            current_node = min(open_list, key=lambda x: x.f)
-            open_list.remove(current_node)
-            closed_list.add(current_node)
-
-            if current_node == end_node:
-                path = []
-                current = current_node
-                while current is not None:
-                    path.append(current.position)
-                    current = current.parent
-                path.pop()
-                return path
-
-            tiles = self.get_surrounding_tiles(current_node.position)
-            random.shuffle(tiles)
-            for tile in tiles:
-                if self.is_moveable_to(tile, skip_enemy=skip_enemy):
-                    node = Node(None, tile)
-                    if node not in closed_list:
-                        node.parent = current_node
-                        node.g = current_node.g + 1
-                        node.h = (
-                            self.get_manhattan_distance(
-                                node.position, end_node.position
-                            )
-                            * self.PATHFINDER_HEURISTIC
-                        )
-                        node.f = node.g + node.h
-                        open_list.append(node)
-        return None
-
-
-class Node:
-    """A node class for A* Pathfinding"""
-
-    def __init__(self, parent=None, position=None):
-        self.parent = parent
-        self.position = position
-        self.g = 0
-        self.h = 0
-        self.f = 0
-
-    def __eq__(self, other):
-        return self.position == other.position
-
-    def __hash__(self):
-        return hash(self.position)
+        return pathing.generate_path(
+            location,
+            target,
+            self.get_surrounding_tiles,
+            lambda tile: self.is_moveable_to(tile, skip_enemy=skip_enemy),
+            self.search_nodes,
+            max_count=max_count,
+            heuristic_weight=self.PATHFINDER_HEURISTIC,
+        )
@@ -6,28 +6,16 @@ All it does is walk around the map.
 import time
 import random
 
+from board import Board
+import pathing
+
 path = []
 path_progress = 0
 
 
-class Node:
-    """A node class for A* Pathfinding"""
-
-    def __init__(self, parent=None, position=None):
-        self.parent = parent
-        self.position = position
-
-        self.g = 0
-        self.h = 0
-        self.f = 0
-
-    def __eq__(self, other):
-        return self.position == other.position
-
-
 class agent:
     def __init__(self):
-        pass
+        self.search_nodes = None
 
     def next_move(self, game_state, player_state):
         """
@@ -47,6 +35,7 @@ class agent:
         self.rows = game_state.size[1]
 
         self.game_state = game_state  # for us to refer to later
+        self.board = Board(game_state, player_state)
 
         self.location = player_state.location
 
@@ -110,7 +99,7 @@ class agent:
         # loop through our tiles
         for tile in all_surrounding_tiles:
             # check if the tile is within the boundaries of the game
-            if self.game_state.is_in_bounds(tile):
+            if self.board.is_in_bounds(tile):
                 # if yes, then add them to our list
                 valid_surrounding_tiles.append(tile)
 
@@ -124,9 +113,10 @@ class agent:
         empty_tiles = []
 
         for tile in tiles:
-            if not self.game_state.is_occupied(tile) or self.game_state.entity_at(
-                tile
-            ) in ["a", "t"]:
+            if not self.board.is_occupied(tile) or self.board.entity_at(tile) in [
+                "a",
+                "t",
+            ]:
                 # the tile isn't occupied, so we'll add it to the list
                 empty_tiles.append(tile)
 
@@ -136,7 +126,7 @@ class agent:
 
         pickups = []
         for tile in tiles:
-            if self.game_state.entity_at(tile) in ["a", "t"]:
+            if self.board.entity_at(tile) in ["a", "t"]:
                 pickups.append(tile)
         if len(pickups) == 0:
             return tiles
@@ -166,84 +156,22 @@ class agent:
         return action
 
     def generate_path(self, location, target):
-        start_node = Node(None, location)
-        start_node.g = start_node.h = start_node.f = 0
-        end_node = Node(None, target)
-        end_node.g = end_node.h = end_node.f = 0
-
-        # Initialize both open and closed list
-        open_list = []
-        closed_list = []
-
-        # Add the start node
-        open_list.append(start_node)
-        # Loop until you find the end
-        while len(open_list) > 0:
-            # Get the current node
-            current_node = open_list[0]
-            current_index = 0
-            for index, item in enumerate(open_list):
-                if item.f < current_node.f:
-                    current_node = item
-                    current_index = index
-
-            # Pop current off open list, add to closed list
-            open_list.pop(current_index)
-            closed_list.append(current_node)
-
-            # Found the goal
-            if current_node == end_node:
-                path = []
-                current = current_node
-                while current is not None:
-                    path.append(current.position)
-                    current = current.parent
-                return path[::-1]  # Return reversed path
-
-            # Generate children
-            children = []
-            for new_position in [(0, -1), (0, 1), (-1, 0), (1, 0)]:  # Adjacent squares
-
-                # Get node position
-                node_position = (
-                    current_node.position[0] + new_position[0],
-                    current_node.position[1] + new_position[1],
-                )
-                if not self.game_state.is_in_bounds(node_position):
-                    continue
-                if self.is_obstructed(node_position):
-                    continue
-
-                # Create new node
-                new_node = Node(current_node, node_position)
-
-                # Append
-                children.append(new_node)
-
-            # Loop through children
-            for child in children:
-
-                # Child is on the closed list
-                for closed_child in closed_list:
-                    if child == closed_child:
-                        continue
-
-                # Create the f, g, and h values
-                child.g = current_node.g + 1
-                child.h = ((child.position[0] - end_node.position[0]) ** 2) + (
-                    (child.position[1] - end_node.position[1]) ** 2
-                )
-                child.f = child.g + child.h
-
-                # Child is already in the open list
-                for open_node in open_list:
-                    if child == open_node and child.g > open_node.g:
-                        continue
-
-                # Add the child to the open list
-                open_list.append(child)
-        pass
+        if self.search_nodes is None:
+            self.search_nodes = pathing.SearchNodes(self.cols, self.rows)
+        path = pathing.generate_path(
+            location,
+            target,
+            self.get_surrounding_tiles,
+            lambda tile: not self.is_obstructed(tile),
+            self.search_nodes,
+            max_count=self.cols * self.rows,
+            heuristic=pathing.squared_distance,
+        )
+        if path is None:
+            return None
+        path.append(location)
+        return path[::-1]  # Start first, the order it is walked in
 
     def is_obstructed(self, location):
-        entity = self.game_state.entity_at(location)
+        entity = self.board.entity_at(location)
         return entity in ["b", "ib", "ob", "sb", "0", "1"]
@@ -0,0 +1,497 @@
+"""Shared pathfinding for agents"""
+import atexit
+from collections import OrderedDict
+import heapq
+
+import snapshot
+import timing
+import workers
+
+boards = {}  # Per process, snapshot.SharedBoard by name, for search_shared
+worker_nodes = {}  # Per process, SearchNodes by arena size, for search_shared
+path_workers = {}  # (size, processes): the PathWorkers every agent here shares
+
+
+def manhattan_distance(a, b):
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+
+def squared_distance(a, b):
+    return ((a[0] - b[0]) ** 2) + ((a[1] - b[1]) ** 2)
+
+
+class SearchNodes:
+    """Flat per-tile search state, reused by every search on one arena.
+
+    g and parent are lists indexed by tile id, x * height + y, allocated once.
+    Rather than clearing them, each search takes a new generation and a slot
+    only counts when its stamp matches, so a search allocates nothing per
+    tile it considers. Keep one per agent, searches sharing one can't overlap.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        cell_count = width * height
+        self.tiles = [(x, y) for x in range(width) for y in range(height)]
+        self.g = [0] * cell_count
+        self.parent = [0] * cell_count
+        self.opened = [0] * cell_count  # Generation g and parent were set in
+        self.closed = [0] * cell_count  # Generation the tile was expanded in
+        self.generation = 0
+        self.expanded = 0  # Tiles the last search expanded
+
+    def start(self):
+        self.generation += 1
+        return self.generation
+
+
+def generate_path(
+    location,
+    target,
+    get_neighbours,
+    is_moveable_to,
+    nodes,
+    max_count=200,
+    heuristic=manhattan_distance,
+    heuristic_weight=1,
+    deadline=None,
+):
+    """A* search backed by a binary heap and the flat arrays of nodes.
+
+    Returns the path in reverse order (target first, location excluded), which
+    is the format get_action_from_path pops from, or None if the target was not
+    reached within max_count expansions. Raises timing.OutOfTime if deadline
+    expires first.
+    """
+    generation = nodes.start()
+    height = nodes.height
+    tiles = nodes.tiles
+    g_scores = nodes.g
+    parents = nodes.parent
+    opened = nodes.opened
+    closed = nodes.closed
+    start = location[0] * height + location[1]
+    goal = target[0] * height + target[1]
+    g_scores[start] = 0
+    opened[start] = generation
+    open_heap = [(0, 0, start)]
+    push_count = 1
+    iter_count = 0
+    while open_heap and iter_count < max_count:
+        _, _, current = heapq.heappop(open_heap)
+        if closed[current] == generation:  # Stale, a cheaper copy was expanded
+            continue
+        closed[current] = generation
+        iter_count += 1
+        if deadline is not None:
+            deadline.check()
+
+        if current == goal:
+            nodes.expanded = iter_count
+            path = []
+            while current != start:
+                path.append(tiles[current])
+                current = parents[current]
+            return path
+
+        g = g_scores[current] + 1
+        for tile in get_neighbours(tiles[current]):
+            index = tile[0] * height + tile[1]
+            if closed[index] == generation or not is_moveable_to(tile):
+                continue
+            if opened[index] != generation or g < g_scores[index]:
+                opened[index] = generation
+                g_scores[index] = g
+                parents[index] = current
+                f = g + heuristic(tile, target) * heuristic_weight
+                heapq.heappush(open_heap, (f, push_count, index))
+                push_count += 1
+    nodes.expanded = iter_count
+    return None
+
+
+def safe_field(
+    location, tick, get_neighbours, is_moveable_to, get_safe_intervals, deadline=None
+):
+    """Earliest safe arrival at every reachable tile, waiting out blasts on the way.
+
+    A search over (tile, tick) states, kept small by grouping the ticks of a
+    tile into the safe intervals get_safe_intervals(tile) returns: sorted
+    (first, last) tick pairs, last None for forever. Every step moves to a
+    neighbour, after waiting in place as long as the current interval allows,
+    so no state ever stands in a blast. Returns (arrivals, parents): the
+    earliest tick each tile is safely reached, and the (tile, tick) state each
+    state was reached from, with None for the start state.
+    """
+    end = tick  # Stuck in a blast we can't wait out, so move at once
+    start_index = -1
+    for index, (first, last) in enumerate(get_safe_intervals(location)):
+        if first <= tick and (last is None or tick <= last):
+            start_index, end = index, last
+    arrivals = {}
+    parents = {(location, tick): None}
+    best = {(location, start_index): tick}
+    closed = set()
+    heap = [(tick, location, start_index, end)]
+    while heap:
+        current_tick, current, index, end = heapq.heappop(heap)
+        if (current, index) in closed:
+            continue
+        closed.add((current, index))
+        if deadline is not None:
+            deadline.check()
+        if current not in arrivals:
+            arrivals[current] = current_tick
+        for tile in get_neighbours(current):
+            for next_index, (first, last) in enumerate(get_safe_intervals(tile)):
+                arrival = max(current_tick + 1, first)
+                if end is not None and arrival - 1 > end:
+                    break  # Can't wait here long enough, nor for any later one
+                if last is not None and arrival > last:
+                    continue
+                key = (tile, next_index)
+                if key in closed or best.get(key, arrival + 1) <= arrival:
+                    continue
+                if not is_moveable_to(tile):
+                    break
+                best[key] = arrival
+                parents[(tile, arrival)] = (current, current_tick)
+                heapq.heappush(heap, (arrival, tile, next_index, last))
+    return arrivals, parents
+
+
+def path_from_safe_field(arrivals, parents, target):
+    """Reads the earliest safe path out of a safe_field search.
+
+    Same format as generate_path, except a tick spent waiting repeats the tile
+    being waited on.
+    """
+    if target not in arrivals:
+        return None
+    path = []
+    state = (target, arrivals[target])
+    while parents[state] is not None:
+        parent = parents[state]
+        path.append(state[0])
+        path.extend([parent[0]] * (state[1] - parent[1] - 1))
+        state = parent
+    return path
+
+
+def search_shared(name, sequence, start, jobs, heuristic, heuristic_weight):
+    """search_blocked over the tiles the SharedBoard called name has blocked,
+    or no answers at all if the board has moved on from sequence
+    """
+    if name not in boards:
+        boards[name] = snapshot.SharedBoard(name=name)
+    board = boards[name]
+    read = board.read_blocked()
+    if read is None or read[0] != sequence:
+        return []
+    size = (board.width, board.height)
+    return search_blocked(read[1], size, start, jobs, heuristic, heuristic_weight)
+
+
+def search_blocked(blocked, size, start, jobs, heuristic, heuristic_weight):
+    """[(index, path)] for each (index, target, max_count) in jobs, path as
+    generate_path gives it or None, with the tiles in the bitmask blocked
+    not walkable.
+
+    Neighbours go left, right, down, up, the order the agents that use
+    PathWorkers list them in, so ties break the same way as in process.
+    """
+    width, height = size
+    if size not in worker_nodes:
+        worker_nodes[size] = SearchNodes(width, height)
+
+    def get_neighbours(location):
+        x, y = location
+        candidates = ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1))
+        return [
+            tile
+            for tile in candidates
+            if 0 <= tile[0] < width and 0 <= tile[1] < height
+        ]
+
+    def is_moveable_to(location):
+        return not blocked >> (location[0] + location[1] * width) & 1
+
+    found = []
+    for index, target, max_count in jobs:
+        path = generate_path(
+            start,
+            target,
+            get_neighbours,
+            is_moveable_to,
+            worker_nodes[size],
+            max_count=max_count,
+            heuristic=heuristic,
+            heuristic_weight=heuristic_weight,
+        )
+        found.append((index, path))
+    return found
+
+
+def get_path_workers(size, processes):
+    """The PathWorkers every agent in the process shares, made on first use"""
+    key = (size, processes)
+    if key not in path_workers:
+        if not path_workers:
+            atexit.register(close_path_workers)
+        path_workers[key] = PathWorkers(size, processes)
+    return path_workers[key]
+
+
+def close_path_workers():
+    while path_workers:
+        path_workers.popitem()[1].close()
+
+
+class PathWorkers:
+    """generate_path searches for many targets, fanned out over a WorkerPool.
+
+    The tiles that can't be walked onto are published on a
+    snapshot.SharedBoard by set_blocked and read from there by the workers,
+    so a call carries only its start and targets. Targets are dealt to the
+    idle workers round robin, and the shortest path found wins, the earliest
+    target on a tie, just as min(paths, key=len) picks from searching them
+    in order. Targets the workers don't answer for in time, with all of
+    them busy every target, are searched in process, so the answer is
+    always the one searching in process gives.
+    """
+
+    def __init__(self, size, processes):
+        self.size = size
+        self.blocked = None
+        # Board first, so the workers share our resource tracker and leave it be
+        self.board = snapshot.SharedBoard(size)
+        self.pool = workers.WorkerPool(processes)
+
+    def set_blocked(self, blocked):
+        """Publishes the tiles that can't be walked onto, unless they're unchanged"""
+        if blocked == self.blocked:
+            return
+        self.blocked = blocked
+        self.board.write_blocked(blocked)
+
+    def search_targets(
+        self, blocked, start, targets, multiplier, timeout, heuristic_weight=1
+    ):
+        """get_shortest_path as get_path_to_best wants it, on blocked as a bitmask.
+
+        Each target gets multiplier expansions per tile of manhattan distance,
+        and the workers timeout seconds. The mask is only written out when it
+        differs from the last one, so every bucket of a tick shares one write.
+        """
+        self.set_blocked(blocked)
+        max_counts = [
+            manhattan_distance(start, target) * multiplier for target in targets
+        ]
+        return self.get_shortest_path(
+            start,
+            targets,
+            max_counts,
+            timing.Deadline(timeout),
+            heuristic_weight=heuristic_weight,
+        )
+
+    def get_shortest_path(
+        self,
+        start,
+        targets,
+        max_counts,
+        deadline,
+        heuristic=manhattan_distance,
+        heuristic_weight=1,
+    ):
+        """Shortest path from start to any of targets in generate_path's format,
+        or None if there is none, the workers searching what they can before
+        deadline
+        """
+        jobs = [(index, *job) for index, job in enumerate(zip(targets, max_counts))]
+        board = (self.board.name, self.board.sequence)
+        options = (heuristic, heuristic_weight)
+        paths = {}  # Index: path or None
+        count = len(self.pool.idle())
+        if count:
+            calls = [
+                (search_shared, board + (start, jobs[offset::count]) + options)
+                for offset in range(min(count, len(jobs)))
+            ]
+            for result in self.pool.run(calls, deadline):
+                paths.update(result or ())
+        unanswered = [job for job in jobs if job[0] not in paths]
+        if unanswered:
+            paths.update(
+                search_blocked(self.blocked, self.size, start, unanswered, *options)
+            )
+        found = [(index, path) for index, path in paths.items() if path is not None]
+        if not found:
+            return None
+        return min(found, key=lambda item: (len(item[1]), item[0]))[1]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+            self.board.close()
+
+
+class PathCache:
+    """Least recently used store of paths, kept while the board around them holds.
+
+    A path is stored under (start, goal) for every tile it passes through, so
+    what's left of it is found again as the agent walks along it. An entry
+    remembers the blocked mask it was planned against, its passability
+    version, and is dropped once a block or bomb appears or disappears on or
+    next to the path, or the enemy steps onto it.
+    """
+
+    def __init__(self, get_neighbours, size=256):
+        self.get_neighbours = get_neighbours
+        self.size = size
+        self.entries = OrderedDict()  # (start, goal): (path, blocked, near, on)
+
+    def put(self, start, path, board):
+        if not path:
+            return
+        goal = path[0]
+        on = board.mask(path)
+        near = on | board.bit(start)
+        for tile in path:
+            near |= board.mask(self.get_neighbours(tile))
+        current = start
+        keys = set()
+        for steps_left in range(len(path), 0, -1):
+            key = (current, goal)
+            if key not in keys:  # After a wait, keep the path from its start
+                keys.add(key)
+                self.entries[key] = (path[:steps_left], board.blocked, near, on)
+                self.entries.move_to_end(key)
+            current = path[steps_left - 1]
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def get(self, start, goal, board):
+        """A copy of the cached path from start to goal, if it is still valid"""
+        key = (start, goal)
+        if key not in self.entries:
+            return None
+        path, blocked, near, on = self.entries[key]
+        if (blocked ^ board.blocked) & near or board.enemy & on:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return list(path)
+
+
+class DStarLite:
+    """Incremental shortest path to a fixed goal for a start that moves.
+
+    D* Lite searches backwards from the goal and keeps its search tree, so
+    after the walker moves or tiles open or close only the part of the tree
+    those changes reach is repaired. Report moves with move_start and tiles
+    whose is_moveable_to answer changed with tiles_changed, then call
+    get_path.
+    """
+
+    INFINITY = float("inf")
+
+    def __init__(
+        self, start, goal, get_neighbours, is_moveable_to, heuristic=manhattan_distance
+    ):
+        self.start = start
+        self.goal = goal
+        self.get_neighbours = get_neighbours
+        self.is_moveable_to = is_moveable_to
+        self.heuristic = heuristic
+        self.key_modifier = 0
+        self.g = {}
+        self.rhs = {goal: 0}
+        self.queue = {}  # Tile: key it is queued under, for lazy heap deletion
+        self.heap = []
+        self.push(goal)
+
+    def calculate_key(self, tile):
+        value = min(self.g.get(tile, self.INFINITY), self.rhs.get(tile, self.INFINITY))
+        return (value + self.heuristic(self.start, tile) + self.key_modifier, value)
+
+    def push(self, tile):
+        key = self.calculate_key(tile)
+        self.queue[tile] = key
+        heapq.heappush(self.heap, (key, tile))
+
+    def cost(self, tile):
+        """Cost of stepping onto tile"""
+        return 1 if self.is_moveable_to(tile) else self.INFINITY
+
+    def update_tile(self, tile):
+        if tile != self.goal:
+            self.rhs[tile] = min(
+                (self.cost(next) + self.g.get(next, self.INFINITY))
+                for next in self.get_neighbours(tile)
+            )
+        self.queue.pop(tile, None)
+        if self.g.get(tile, self.INFINITY) != self.rhs.get(tile, self.INFINITY):
+            self.push(tile)
+
+    def top_key(self):
+        while self.heap:
+            key, tile = self.heap[0]
+            if self.queue.get(tile) == key:
+                return key
+            heapq.heappop(self.heap)  # Stale, the tile was requeued or settled
+        return (self.INFINITY, self.INFINITY)
+
+    def compute(self, deadline=None):
+        while self.top_key() < self.calculate_key(self.start) or self.g.get(
+            self.start, self.INFINITY
+        ) != self.rhs.get(self.start, self.INFINITY):
+            if deadline is not None:
+                deadline.check()
+            old_key, tile = heapq.heappop(self.heap)
+            new_key = self.calculate_key(tile)
+            if old_key < new_key:
+                self.push(tile)
+                continue
+            del self.queue[tile]
+            g = self.g.get(tile, self.INFINITY)
+            if g > self.rhs[tile]:
+                self.g[tile] = self.rhs[tile]
+                for neighbour in self.get_neighbours(tile):
+                    self.update_tile(neighbour)
+            else:
+                self.g[tile] = self.INFINITY
+                self.update_tile(tile)
+                for neighbour in self.get_neighbours(tile):
+                    self.update_tile(neighbour)
+
+    def move_start(self, start):
+        self.key_modifier += self.heuristic(self.start, start)
+        self.start = start
+
+    def tiles_changed(self, tiles):
+        """Repairs the tree around tiles whose is_moveable_to answer changed"""
+        for tile in tiles:
+            for neighbour in self.get_neighbours(tile):
+                self.update_tile(neighbour)
+
+    def get_path(self, deadline=None):
+        """Shortest path in generate_path's format, or None if there is none"""
+        self.compute(deadline)
+        if self.g.get(self.start, self.INFINITY) == self.INFINITY:
+            return None
+        path = []
+        current = self.start
+        while current != self.goal:
+            costs = [
+                (self.cost(tile) + self.g.get(tile, self.INFINITY), tile)
+                for tile in self.get_neighbours(current)
+            ]
+            cost, current = min(costs)
+            if cost == self.INFINITY:
+                return None
+            path.append(current)
+        path.reverse()
+        return path
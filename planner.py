@@ -0,0 +1,51 @@
+"""Background planning between moves"""
+import threading
+
+import timing
+
+
+class Planner:
+    """Runs one speculative plan at a time on a background thread.
+
+    The plan is called with its own timing.Deadline and its result is stored
+    against the key describing the state it assumed, so the next move can
+    check the assumption before trusting it. A plan that ran out of time,
+    raising or settling for what it had, leaves no result.
+    """
+
+    def __init__(self):
+        self.thread = None
+        self.deadline = None
+        self.key = None
+        self.result = None
+        self.cut_short = False  # Whether the last plan ran out of time
+
+    def start(self, key, plan, budget):
+        self.stop()
+        self.deadline = timing.Deadline(budget)
+        self.key = key
+        self.result = None
+        self.cut_short = False
+        self.thread = threading.Thread(target=self.run, args=(plan,), daemon=True)
+        self.thread.start()
+
+    def run(self, plan):
+        try:
+            result = plan(self.deadline)
+        except timing.OutOfTime:
+            result = None
+        # Searches under a deadline may settle for their best so far instead
+        # of raising, so a plan that finished late isn't trusted either
+        self.cut_short = self.deadline.expired()
+        self.result = None if self.cut_short else result
+
+    def stop(self):
+        """Cancels any running plan and returns (key, result) of the last one"""
+        if self.thread is not None:
+            if self.thread.is_alive():
+                self.deadline.cancel()
+                self.thread.join()
+            self.thread = None
+        key, result = self.key, self.result
+        self.key = self.result = None
+        return key, result
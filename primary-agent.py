@@ -1,8 +1,15 @@
 """File for primary agent"""
-import random
-
 from coderone.dungeon.agent import PlayerState, GameState
-import cProfile
+
+import blasts
+import lookahead
+import mcts
+import pathing
+import planner
+from board import Arena, Board
+import scoring
+import timing
+import traps
 
 
 class Agent:
@@ -23,17 +30,33 @@ class Agent:
     MIN_AMMO_WEIGHTING = 1
 
     PATHFINDER_HEURISTIC = 7
-    PATHFINDER_ITERATION_MULTIPLIER = 4.6
 
     WAITING_BLOCKS = [(5, 5), (5, 4), (6, 5), (6, 4)]
 
     MAX_DESYNC = 2
 
-    IMPENETRABLE_OBJECTS = {"b", "ib", "ob", "sb"}
+    MOVE_TIME_BUDGET = 0.05  # Seconds, well inside the engine's tick window
+    PROFILE_MODE = False  # Print every phase's move timings at exit
+
+    PLANNER_MODE = False  # Plan the next tick on a background thread
+    PLANNER_TIME_BUDGET = 0.05
+
+    LOOKAHEAD_MODE = False  # Check each move against the enemy's best replies
+    LOOKAHEAD_TIME_BUDGET = 0.02
+    LOOKAHEAD_RANGE = 4  # Enemy distance the check starts at
+    LOOKAHEAD_MARGIN = 5  # Value a better move must win by to replace ours
+    ENEMY_AMMO = 1  # Assumed, the enemy's ammo and hp aren't visible
+    ENEMY_HP = 3
+
+    MCTS_MODE = False  # Choose each move by tree search seeded by the heuristics
+    MCTS_MARGIN = 0.1  # Mean value a better move must win by to replace ours
+    MCTS_PROCESSES = 1  # More searches the root in that many worker processes
+    ATTACK_VALUE = 5  # Rollout value of the tiles next to the enemy when attacking
 
     def __init__(self):
         self.tick_number = 0
-        self.bombs = {}
+        self.bombs = blasts.BombGraph()
+        self.bombs_blocked = 0  # Board.blocked the blasts were last checked against
         self.first = True
         self.target = None
         self.path = []
@@ -44,23 +67,41 @@ class Agent:
         self.block_counter = [0, 0]
         self.game_stage = self.OPENING
         self.missed_turns = 0
-        self.x_bound = 11
-        self.y_bound = 9
         self.enemy_id = -1
         self.attack_enemy = False
-        self.bomb_map = {}
-
-    # def next_move(self, game_state, player_state):
-    #     cProfile.runctx('self.next_move_alt(g, p)', {'g': game_state, 'p': player_state, 'self': self}, {}, 'out.pstat')
-    #     quit()
+        self.danger = None
+        self.arrivals = {}
+        self.parents = {}
+        self.value_map = scoring.ValueMap()
+        self.deadline = None
+        self.fallback = self.DO_NOTHING
+        self.planner = planner.Planner()
+        self.traps = None
+        self.path_cache = None
+        self.search_nodes = None
+        self.lookahead = None
+        self.tree_search = None
+        self.target_planner = None
+        self.target_planner_blocked = 0
+        self.profile = timing.get_profile(__name__)
+        if self.PROFILE_MODE:
+            timing.dump_at_exit(__name__)
 
     def next_move(self, game_state: GameState, player_state: PlayerState):
         """This method is called each time the player needs to choose an action"""
+        with self.profile.phase("next_move"):
+            return self.choose_move(game_state, player_state)
+
+    def choose_move(self, game_state, player_state):
+        planned = self.planner.stop()
+        self.deadline = timing.Deadline(self.MOVE_TIME_BUDGET)
         self.game_state = game_state
         self.player_state = player_state
+        self.board = Board(game_state, player_state)
 
         if self.first:
             self.on_first()
+        self.traps = traps.TrapMap(self.board, self.arena, self.deadline)
 
         if self.tick_number != game_state.tick_number:
             print("Took too long to make move")
@@ -68,8 +109,10 @@ class Agent:
         else:
             self.synced = True
 
-        self.track_bombs(game_state.bombs)
-        self.create_bomb_map()
+        with self.profile.phase("track_bombs"):
+            self.track_bombs(game_state.bombs)
+        with self.profile.phase("create_bomb_map"):
+            self.create_bomb_map()
 
         if self.synced and self.player_location != player_state.location:
             last_move = self.move_history[-1]
@@ -86,16 +129,37 @@ class Agent:
 
         if self.synced:
             self.desync_count = 0
-            to_avoid = self.avoid_bombs_and_traps()
-            if to_avoid is not None:
-                return self.make_move(to_avoid)
-            self.update_game_stage()
-            worth_attempting = self.get_locations_worth_attempting()
-            self.path = self.get_path_to_best(worth_attempting)
-            if self.path:
-                self.target = self.path[0]
-            next = self.get_action_from_path()
-            return self.make_move(next)
+            self.fallback = self.get_fallback_action()
+            try:
+                with self.profile.phase("avoid_bombs_and_traps"):
+                    next = self.avoid_bombs_and_traps()
+                if next is None:
+                    self.update_game_stage()
+                    self.path = self.get_planned_path(planned)
+                    if self.path is None:
+                        with self.profile.phase("get_locations_worth_attempting"):
+                            worth_attempting = self.get_locations_worth_attempting()
+                        with self.profile.phase("get_path_to_best"):
+                            self.path = self.get_path_to_best(worth_attempting)
+                    if self.path:
+                        self.target = self.path[0]
+                    with self.profile.phase("get_action_from_path"):
+                        next = self.get_action_from_path()
+            except timing.OutOfTime:
+                print("Out of time, using fallback move", repr(self.fallback))
+                self.path = []
+                self.target = None
+                next = self.fallback
+            if self.MCTS_MODE:
+                with self.profile.phase("mcts"):
+                    next = self.choose_with_mcts(next)
+            elif self.LOOKAHEAD_MODE:
+                with self.profile.phase("lookahead"):
+                    next = self.check_with_lookahead(next)
+            move = self.make_move(next)
+            if self.PLANNER_MODE:
+                self.start_planning(move)
+            return move
         else:
             self.desync_count += 1
             self.missed_turns += 1
@@ -138,23 +202,29 @@ class Agent:
         return move
 
     def is_moveable_to(self, location, skip_enemy=False):
-        if self.game_state.is_in_bounds(location):
-            entity = self.game_state.entity_at(location)
-            return entity not in self.IMPENETRABLE_OBJECTS and (
-                skip_enemy or entity != self.enemy_id
-            )
-        return False
+        return self.board.is_moveable_to(location, skip_enemy=skip_enemy)
 
     def on_first(self):
         self.first = False
+        self.search_nodes = pathing.SearchNodes(*self.game_state.size)
+        if self.LOOKAHEAD_MODE:
+            self.lookahead = lookahead.Lookahead(self.player_state.id)
+        if self.MCTS_MODE and self.MCTS_PROCESSES > 1:
+            self.tree_search = mcts.RootParallelSearch(
+                self.player_state.id, self.MCTS_PROCESSES
+            )
+        elif self.MCTS_MODE:
+            self.tree_search = mcts.TreeSearch(self.player_state.id)
         self.player_location = self.player_state.location
         self.enemy_id = int(self.player_state.id == 0)
+        self.arena = Arena(self.game_state.size)
+        self.path_cache = pathing.PathCache(self.get_surrounding_tiles)
         self.ores = {ore: 3 for ore in self.game_state.ore_blocks}
 
     def update_game_stage(self):
         next_stage = self.game_stage
-        current_block_count = len(self.game_state.soft_blocks)
-        if len(self.game_state.ore_blocks) < 1:
+        current_block_count = self.board.count(self.board.soft_blocks)
+        if not self.board.ore_blocks:
             next_stage = self.END
             score = self.player_state.reward
             damage_taken = 3 - self.player_state.hp
@@ -176,22 +246,24 @@ class Agent:
             self.game_stage = next_stage
 
     def track_bombs(self, bombs):
+        for location in list(self.bombs):
+            if location not in bombs:  # Gone off, maybe early in a chain
+                self.bombs.remove(location)
+        self.bombs.expire(self.tick_number)
+
         bombs_to_add = []
         for bomb in bombs:
             if bomb not in self.bombs:
                 bombs_to_add.append(bomb)
 
         for bomb in bombs_to_add:
-            self.bombs[bomb] = self.tick_number
+            self.bombs.add(bomb, self.tick_number, self.bomb_affect(bomb))
             self.on_bomb_plant(bomb)
 
-        detonation_tick = self.tick_number - 35
-        to_delete = []
-        for location, tick in self.bombs.items():
-            if tick < detonation_tick:
-                to_delete.append(location)
-        for loc in to_delete:
-            del self.bombs[loc]
+        # Blasts grow or shrink as blocks and bombs come and go around them
+        changed = self.board.blocked ^ self.bombs_blocked
+        self.bombs.refresh(self.board.locations(changed), self.bomb_affect)
+        self.bombs_blocked = self.board.blocked
 
     def on_bomb_plant(self, location):
         affected = self.bomb_affect(location)
@@ -202,23 +274,17 @@ class Agent:
                     diff = tuple((x - y) * -1 for x, y in zip(location, tile))
                     if (location[0] + diff[0], location[1] + diff[1]) in self.bombs:
                         self.ores[tile] += 1
-            elif tile in self.bombs:
-                self.bombs[location] = self.bombs[tile] + 1
 
     def create_bomb_map(self):
-        bomb_map = {}
-        for bomb in self.bombs:
-            if bomb not in bomb_map or bomb_map[bomb] > self.bombs[bomb] + 35:
-                bomb_map[bomb] = self.bombs[bomb] + 35
-            for tile in self.bomb_affect(bomb):
-                if tile not in bomb_map or bomb_map[tile] > self.bombs[bomb] + 35:
-                    bomb_map[tile] = self.bombs[bomb] + 35
-        self.bomb_map = bomb_map
+        width, height = self.board.width, self.board.height
+        self.danger = scoring.DangerMap(
+            self.bombs.detonations,
+            scoring.to_grid(self.board.blocked, width, height),
+            scoring.to_grid(self.board.ore_blocks, width, height),
+        )
 
     def is_safe(self, location, tick, late_game=False):
-        if location not in self.bomb_map:
-            return True
-        det_tick = self.bomb_map[location]
+        det_tick = self.danger.rows[location[0]][location[1]]
         if late_game:
             if det_tick < tick + 5:
                 return False
@@ -226,44 +292,55 @@ class Agent:
             return False
         return True
 
-    def is_trap(self, location, skip_cells=()):
-        for tile in self.get_surrounding_tiles(location):
-            if tile not in skip_cells and self.is_moveable_to(tile):
-                return False
-        return True
+    def get_safe_intervals(self, location):
+        """Ticks clear of every blast on location, as (first, last) pairs for safe_field
+
+        The danger map only keeps the earliest detonation, so a later bomb
+        covering the same tile would read as safe once the first had gone off.
+        """
+        ticks = {
+            self.bombs.detonations[bomb]
+            for bomb in self.bombs.covering.get(location, ())
+            if bomb in self.bombs.detonations
+        }
+        det_tick = self.danger.rows[location[0]][location[1]]
+        if det_tick != scoring.NO_DANGER:
+            ticks.add(det_tick)
+        intervals = []
+        first = 0
+        for tick in sorted(ticks):
+            # Unsafe from the tick before a detonation through the detonation
+            if tick - 2 >= first:
+                intervals.append((first, tick - 2))
+            first = max(first, tick + 1)
+        intervals.append((first, None))
+        return tuple(intervals)
+
+    def is_path_safe(self, path):
+        """Whether a path walked from the next tick stays out of every blast"""
+        return all(
+            self.is_safe(tile, self.tick_number + ticks)
+            for ticks, tile in enumerate(reversed(path), 1)
+        )
 
-    def get_manhattan_distance(self, a, b):  # TODO: Make global
-        return abs(a[0] - b[0]) + abs(a[1] - b[1])
+    def is_trap(self, location, skip_cells=()):
+        return self.traps.is_trap(location, skip_cells)
 
     def bomb_affect(self, loc):
         affected = []
-        for axis in (0, 1):
-            for direction in (-1, 1):
-                for distance in (1, 2):
-                    if axis == 0:
-                        new_value = loc[0] + (distance * direction)
-                        if 0 <= new_value <= self.x_bound:
-                            coords = (new_value, loc[1])
-                        else:
-                            continue
-                    else:
-                        new_value = loc[1] + (distance * direction)
-                        if 0 <= new_value <= self.x_bound:
-                            coords = (loc[0], new_value)
-                        else:
-                            continue
-                    entity = self.game_state.entity_at(coords)
-                    if distance > 1 and entity == "ob":
-                        break
-                    affected.append(coords)
-                    if entity in self.IMPENETRABLE_OBJECTS:
-                        break
+        for ray in self.arena.blast_rays[loc]:
+            for distance, coords in enumerate(ray, 1):
+                if distance > 1 and self.board.entity_at(coords) == "ob":
+                    break
+                affected.append(coords)
+                if self.board.blocks_blast(coords):
+                    break
         return affected
 
     def bombing_value(self, loc, inculde_pickups=True):
         points = 0
 
-        entity = self.game_state.entity_at(loc)
+        entity = self.board.entity_at(loc)
         if inculde_pickups:
             if entity == "t":
                 points += 1
@@ -282,7 +359,7 @@ class Agent:
             cells = self.get_surrounding_tiles(loc)
             safe = True
             for cell in cells:
-                if self.game_state.entity_at(cell) is not None:
+                if self.board.entity_at(cell) is not None:
                     safe = False
             if safe:
                 points += 10
@@ -295,7 +372,7 @@ class Agent:
                     diff = tuple((x - y) * -1 for x, y in zip(loc, location))
                     if (loc[0] + diff[0], loc[1] + diff[1]) in self.bombs:
                         continue
-                entity = self.game_state.entity_at(location)
+                entity = self.board.entity_at(location)
                 if entity == "ob" and (
                     (
                         self.game_stage == self.MIDDLE
@@ -306,7 +383,7 @@ class Agent:
                     points += 10 / self.ores[location]
                 elif entity == self.enemy_id and self.attack_enemy:
                     points += 0.5
-                elif location in self.bomb_map:
+                elif self.danger.get(location) != scoring.NO_DANGER:
                     continue
                 elif entity == "sb":
                     points += 2
@@ -324,24 +401,15 @@ class Agent:
         if move == self.DOWN:
             return self.is_moveable_to((position[0], position[1] - 1))
         if move == self.BOMB:
-            if self.game_state.entity_at(position) == self.player_state.id:
+            if self.board.entity_at(position) == self.player_state.id:
                 return True
             else:
                 return False
         raise ValueError
 
     def get_surrounding_tiles(self, location):
-        """Gets a list of surrounding tiles from up, down, left right"""
-        surrounding_tiles = []
-        if location[1] != self.y_bound:  # UP
-            surrounding_tiles.append((location[0], location[1] + 1))
-        if location[0] != self.x_bound:  # RIGHT
-            surrounding_tiles.append((location[0] + 1, location[1]))
-        if location[1] != 0:  # DOWN
-            surrounding_tiles.append((location[0], location[1] - 1))
-        if location[0] != 0:  # LEFT
-            surrounding_tiles.append((location[0] - 1, location[1]))
-        return surrounding_tiles
+        """Gets a tuple of surrounding tiles from up, right, down, left"""
+        return self.arena.neighbours[location]
 
     def move_to_tile(self, current_location, destination):
         """Movement input is calculated based on target tile distance delta"""
@@ -365,58 +433,99 @@ class Agent:
         return action
 
     def get_locations_worth_attempting(self):
-        x_bound, y_bound = self.game_state.size
-        worth_attempting = {}
-        for x in range(x_bound):
-            for y in range(y_bound):
-                coords = (x, y)
-                if self.is_moveable_to(coords):
-                    value = self.bombing_value(coords)
-                    if value > 0.0:
-                        if value in worth_attempting:
-                            worth_attempting[value].append(coords)
-                        else:
-                            worth_attempting[value] = [coords]
-        return worth_attempting
+        self.deadline.check()
+        grids = scoring.BoardGrids(self.board)
+        width, height = self.board.width, self.board.height
+        values = self.value_map.update(
+            grids,
+            scoring.locations_to_grid(
+                self.ores.keys(), width, height, self.ores.values(), dtype=float
+            ),
+            scoring.locations_to_grid(self.bombs, width, height),
+            self.danger.in_blast(),
+            self.game_stage,
+            self.player_state.ammo,
+            self.attack_enemy,
+            self.MAX_AMMO_WEIGHTING[self.game_stage],
+            self.MIN_AMMO_WEIGHTING,
+        )
+        return scoring.value_buckets(values, grids.moveable)
+
+    def flood(self):
+        """Earliest safe arrival at every tile from where we are this tick"""
+        self.arrivals, self.parents = pathing.safe_field(
+            self.player_location,
+            self.tick_number,
+            self.get_surrounding_tiles,
+            lambda tile: self.is_moveable_to(tile, skip_enemy=True),
+            self.get_safe_intervals,
+            deadline=self.deadline,
+        )
 
     def get_path_to_best(self, worth_attempting):
         current_location = self.player_location
+        flooded = False
         values = sorted(worth_attempting.keys(), reverse=True)
         for value in values:
             targets = worth_attempting[value]
             paths = []
-            if (
-                self.target in targets
-                and self.path
-                and self.path[-1] in self.get_surrounding_tiles(self.player_location)
-                and self.is_moveable_to(self.path[-1], skip_enemy=False)
-            ):
-                return self.path
+            if self.target in targets:
+                path = self.path_cache.get(current_location, self.target, self.board)
+                if path is None:
+                    path = self.replan_target()
+                    if path is not None:
+                        self.path_cache.put(current_location, path, self.board)
+                if path is not None and self.is_path_safe(path):
+                    return path
+            if not flooded:
+                self.flood()
+                flooded = True
             for coords in targets:
+                if self.deadline.expired():
+                    if paths:  # Settle for the best path found so far
+                        break
+                    raise timing.OutOfTime
                 if current_location == coords:
                     return []
                 if self.is_trap(coords):
                     continue
-                distance = self.get_manhattan_distance(current_location, coords)
-                path = self.generate_path(
-                    current_location,
-                    coords,
-                    max_count=distance * self.PATHFINDER_ITERATION_MULTIPLIER,
+                path = pathing.path_from_safe_field(
+                    self.arrivals, self.parents, coords
                 )
                 if path is not None:
                     paths.append(path)
             if paths != []:
-                return min(paths, key=len)
+                path = min(paths, key=len)
+                self.path_cache.put(current_location, path, self.board)
+                return path
         if self.player_state.ammo > 0:
             return []
+        if not flooded:
+            self.flood()
         return self.get_path_to_centre()
 
+    def replan_target(self):
+        """Repairs the path to the committed target after the board changed"""
+        planner = self.target_planner
+        if planner is None or planner.goal != self.target:
+            planner = self.target_planner = pathing.DStarLite(
+                self.player_location,
+                self.target,
+                self.get_surrounding_tiles,
+                lambda tile: self.is_moveable_to(tile, skip_enemy=True),
+            )
+        else:
+            planner.move_start(self.player_location)
+            changed = self.board.blocked ^ self.target_planner_blocked
+            planner.tiles_changed(self.board.locations(changed))
+        self.target_planner_blocked = self.board.blocked
+        return planner.get_path(self.deadline)
+
     def get_path_to_centre(self):
-        current_location = self.player_state.location
-        if current_location in self.WAITING_BLOCKS:
+        if self.player_location in self.WAITING_BLOCKS:
             return []
         for tile in self.WAITING_BLOCKS:
-            path = self.generate_path(current_location, tile)
+            path = pathing.path_from_safe_field(self.arrivals, self.parents, tile)
             if path is not None:
                 return path
         return []
@@ -438,10 +547,13 @@ class Agent:
                 return self.DO_NOTHING
         else:
             target = self.path[-1]
+            if target == self.player_location:  # Waiting out a blast on the path
+                self.path.pop()
+                return self.DO_NOTHING
             if not self.is_safe(target, self.tick_number + 1):
                 print("Avoiding Bomb, Waiting one turn")
                 return self.DO_NOTHING
-            if self.game_state.entity_at(self.player_location) == self.BOMB:
+            if self.board.entity_at(self.player_location) == self.BOMB:
                 trap, exit = self.get_trap_details(target)
                 if trap is not None and exit is None:
                     print("Avoiding Trap, Waiting one turn")
@@ -463,57 +575,80 @@ class Agent:
             return next
 
     def get_trap_details(self, location):
-        starting_tiles = [
-            tile
-            for tile in self.get_surrounding_tiles(location)
-            if self.is_moveable_to(tile, skip_enemy=False)
-        ]
-        move_count = len(starting_tiles)
-        if move_count > 2:
-            return None, None
-        if move_count == 0:
-            return location, None
-        exit = None
-        trap = None
-        open_tiles = starting_tiles
-        closed_tiles = {self.player_location}
-        while len(open_tiles) > 0:
-            current_tile = open_tiles.pop()
-            closed_tiles.add(current_tile)
-            neighbours = [
-                tile
-                for tile in self.get_surrounding_tiles(current_tile)
-                if tile not in closed_tiles
-                and self.is_moveable_to(tile, skip_enemy=False)
-            ]
-            n_count = len(neighbours)
-            if n_count == 0:  # Trap
-                if trap is None:
-                    trap = current_tile
-                else:
-                    return trap, None
-            elif n_count > 1:  # exit
-                if exit is None:
-                    exit = current_tile
-                else:
-                    return trap, None
-            else:
-                open_tiles.extend(neighbours)
-        return trap, exit
+        return self.traps.get_trap_details(location, self.player_location)
+
+    def get_fallback_action(self):
+        """Cheap safe action to take if the move runs out of time"""
+        if all(
+            self.is_safe(self.player_location, self.tick_number + ticks)
+            for ticks in (1, 2, 3)
+        ):
+            return self.DO_NOTHING
+        for tile in self.get_surrounding_tiles(self.player_location):
+            if self.is_moveable_to(tile) and self.is_safe(tile, self.tick_number + 2):
+                return self.move_to_tile(self.player_location, tile)
+        return self.DO_NOTHING
+
+    def start_planning(self, move):
+        """Plans the tick we expect next on a background thread"""
+        if move == self.BOMB:
+            return
+        for tick in self.bombs.detonations.values():
+            if tick <= self.tick_number + 1:  # A blast will change the board
+                return
+        board = self.board.moved(self.player_location)
+        key = (
+            self.tick_number,
+            self.player_location,
+            self.game_stage,
+            self.attack_enemy,
+            self.player_state.ammo,
+            board,
+        )
+        self.planner.start(
+            key,
+            lambda deadline: self.plan_next_move(board, deadline),
+            self.PLANNER_TIME_BUDGET,
+        )
+
+    def plan_next_move(self, board, deadline):
+        self.board = board
+        self.traps = traps.TrapMap(board, self.arena, deadline)
+        self.deadline = deadline
+        return self.get_path_to_best(self.get_locations_worth_attempting())
+
+    def get_planned_path(self, planned):
+        """Path from the background planner, if the state it expected came true"""
+        key, path = planned
+        if path is None:
+            return None
+        *expected, board = key
+        actual = (
+            self.tick_number,
+            self.player_location,
+            self.game_stage,
+            self.attack_enemy,
+            self.player_state.ammo,
+        )
+        if tuple(expected) != actual or not self.board.same_layout(board):
+            return None
+        if any(self.board.bit(tile) & self.board.enemy for tile in path):
+            return None
+        return path
 
     def avoid_bombs_and_traps(self):
-        if self.player_location not in self.bomb_map:
+        if self.danger.get(self.player_location) == scoring.NO_DANGER:
             _, exit = self.get_trap_details(self.player_location)
             if exit is None:
                 return None
-            opponent = self.game_state.opponents(self.player_state.id)[0]
+            opponent = self.board.enemy_location
             path_to_opponent = self.generate_path(
                 self.player_location, opponent, skip_enemy=True
             )
             if path_to_opponent is None:
                 return None
-            path_to_escape = self.generate_path(
-                self.player_location, exit, skip_enemy=False
+            path_to_escape = self.traps.get_escape_path(
+                self.player_location, self.player_location
             )
             if len(path_to_opponent) <= len(path_to_escape):
                 return self.move_to_tile(self.player_location, path_to_escape.pop())
@@ -539,61 +674,96 @@ class Agent:
                 print("Unable to escape bomb")
             return None
 
-    def generate_path(self, location, target, max_count=200, skip_enemy=True):
-        start_node = Node(None, location)
-        start_node.g = start_node.h = start_node.f = 0
-        end_node = Node(None, target)
-        end_node.g = end_node.h = end_node.f = 0
-        open_list = []
-        closed_list = set()
-        open_list.append(start_node)
-        iter_count = 0
-        while iter_count < max_count and len(open_list) > 0:
-            iter_count += 1
-            current_node = min(open_list, key=lambda x: x.f)
-            open_list.remove(current_node)
-            closed_list.add(current_node)
-
-            if current_node == end_node:
-                path = []
-                current = current_node
-                while current is not None:
-                    path.append(current.position)
-                    current = current.parent
-                path.pop()
-                return path
+    def check_with_lookahead(self, move):
+        """Swaps move for a better one if the nearby enemy can punish it"""
+        enemy = self.board.enemy_location
+        if (
+            enemy is None
+            or pathing.manhattan_distance(enemy, self.player_location)
+            > self.LOOKAHEAD_RANGE
+        ):
+            return move
+        state = self.get_arena_state(enemy)
+        budget = min(self.LOOKAHEAD_TIME_BUDGET, self.deadline.remaining())
+        best = self.lookahead.choose(state, timing.Deadline(budget), preferred=move)
+        if best is None:
+            return move
+        values = self.lookahead.values
+        if values[best] - values.get(move, values[lookahead.STAY]) > (
+            self.LOOKAHEAD_MARGIN
+        ):
+            self.path = []
+            self.target = None
+            return best
+        return move
 
-            tiles = self.get_surrounding_tiles(current_node.position)
-            random.shuffle(tiles)
-            for tile in tiles:
-                if self.is_moveable_to(tile, skip_enemy=skip_enemy):
-                    node = Node(None, tile)
-                    if node not in closed_list:
-                        node.parent = current_node
-                        node.g = current_node.g + 1
-                        node.h = (
-                            self.get_manhattan_distance(
-                                node.position, end_node.position
-                            )
-                            * self.PATHFINDER_HEURISTIC
-                        )
-                        node.f = node.g + node.h
-                        open_list.append(node)
-        return None
-
-
-class Node:
-    """A node class for A* Pathfinding"""
-
-    def __init__(self, parent=None, position=None):
-        self.parent = parent
-        self.position = position
-        self.g = 0
-        self.h = 0
-        self.f = 0
-
-    def __eq__(self, other):
-        return self.position == other.position
-
-    def __hash__(self):
-        return hash(self.position)
+    def choose_with_mcts(self, move):
+        """Most simulated move of a tree search that runs out the move's deadline.
+
+        Rollouts favour the tiles bombing_value scores highly in the current
+        game stage. move, the heuristics' choice, is searched first and kept
+        unless another move's mean value beats it by MCTS_MARGIN.
+        """
+        enemy = self.board.enemy_location
+        if enemy is None:
+            return move
+        self.update_game_stage()
+        walkable = list(self.board.locations(self.board.full & ~self.board.blocked))
+        values = {}
+        for tile in walkable:
+            value = self.bombing_value(tile)
+            if value:
+                values[tile] = value
+        if self.attack_enemy:
+            for tile in self.get_surrounding_tiles(enemy):
+                values[tile] = values.get(tile, 0) + self.ATTACK_VALUE
+        policy = mcts.RolloutPolicy(self.arena, values, walkable)
+        best = self.tree_search.search(
+            self.get_arena_state(enemy), policy, self.deadline, preferred=move
+        )
+        if best is None or best == move:
+            return move
+        values = self.tree_search.values
+        if move in values and values[best] - values[move] <= self.MCTS_MARGIN:
+            return move
+        self.path = []
+        self.target = None
+        return best
+
+    def get_arena_state(self, enemy):
+        """This tick as a lookahead.ArenaState, guessing what isn't visible"""
+        # Bombs are first seen the tick after they were planted
+        bombs = {
+            location: (tick + self.bombs.FUSE - 1, None)
+            for location, tick in self.bombs.planted.items()
+        }
+        # self.ores already counts the hits of bombs yet to go off, and keeps
+        # ores that are gone, counted on past zero
+        ore_hits = {
+            ore: max(hits + len(self.bombs.covering.get(ore, ())), 0)
+            for ore, hits in self.ores.items()
+            if self.board.ore_blocks & self.board.bit(ore)
+        }
+        players = [None, None]
+        players[self.player_state.id] = (
+            self.player_location,
+            self.player_state.ammo,
+            self.player_state.hp,
+            0,
+        )
+        players[self.enemy_id] = (enemy, self.ENEMY_AMMO, self.ENEMY_HP, 0)
+        return lookahead.ArenaState(
+            self.arena, self.tick_number, self.board, bombs, ore_hits, players
+        )
+
+    def generate_path(self, location, target, max_count=200, skip_enemy=True):
+        return pathing.generate_path(
+            location,
+            target,
+            self.get_surrounding_tiles,
+            lambda tile: self.is_moveable_to(tile, skip_enemy=skip_enemy),
+            self.search_nodes,
+            max_count=max_count,
+            heuristic_weight=self.PATHFINDER_HEURISTIC,
+            deadline=self.deadline,
+        )
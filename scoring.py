@@ -0,0 +1,357 @@
+"""Vectorised bombing_value scoring of the whole arena"""
+import numpy as np
+
+OPENING = "o"
+MIDDLE = "m"
+END = "e"
+
+DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+NO_DANGER = 2**31 - 1  # Detonation tick of a tile no blast reaches
+
+
+def to_grid(mask, width, height):
+    """Unpacks a Board bitmask into a bool array indexed [x, y]"""
+    cell_count = width * height
+    data = np.frombuffer(mask.to_bytes((cell_count + 7) // 8, "little"), np.uint8)
+    bits = np.unpackbits(data, bitorder="little")[:cell_count]
+    return bits.reshape(height, width).T.astype(bool)
+
+
+def locations_to_grid(locations, width, height, values=None, dtype=bool):
+    grid = np.zeros((width, height), dtype=dtype)
+    if values is None:
+        for location in locations:
+            grid[location] = True
+    else:
+        for location, value in zip(locations, values):
+            grid[location] = value
+    return grid
+
+
+def shift(grid, dx, dy, fill):
+    """Returns S where S[x, y] == grid[x + dx, y + dy], or fill off the arena"""
+    width, height = grid.shape
+    source = (
+        slice(max(dx, 0), width + min(dx, 0)),
+        slice(max(dy, 0), height + min(dy, 0)),
+    )
+    target = (
+        slice(max(-dx, 0), width + min(-dx, 0)),
+        slice(max(-dy, 0), height + min(-dy, 0)),
+    )
+    shifted = np.full_like(grid, fill)
+    shifted[target] = grid[source]
+    return shifted
+
+
+class BoardGrids:
+    """NumPy copies of a Board's bitmasks, indexed [x, y]"""
+
+    MASKS = (
+        "soft_blocks",
+        "ore_blocks",
+        "bombs",
+        "ammo",
+        "treasure",
+        "enemy",
+        "blocked",
+        "occupied",
+    )
+
+    def __init__(self, board):
+        self.width = board.width
+        self.height = board.height
+        for name in self.MASKS:
+            grid = to_grid(getattr(board, name), board.width, board.height)
+            setattr(self, name, grid)
+        self.moveable = ~(self.blocked | self.enemy)
+
+    def window(self, x_slice, y_slice):
+        """Copy of these grids cut down to a rectangle of the arena"""
+        window = object.__new__(BoardGrids)
+        for name in self.MASKS + ("moveable",):
+            setattr(window, name, getattr(self, name)[x_slice, y_slice])
+        window.width, window.height = window.moveable.shape
+        return window
+
+
+def danger_ticks(detonations, blocked, ore_blocks=None):
+    """Earliest tick a blast reaches each tile, NO_DANGER where none does.
+
+    detonations maps bomb locations to the tick they go off and blocked marks
+    the tiles that stop a blast after it hits them. Blasts reach two tiles
+    each way, and given ore_blocks an ore block is only hit from next to the
+    bomb, as the agents' bomb_affect has it.
+    """
+    bombs = np.full(blocked.shape, NO_DANGER, dtype=np.int64)
+    for location, tick in detonations.items():
+        bombs[location] = min(bombs[location], tick)
+    danger = bombs.copy()
+    for dx, dy in DIRECTIONS:
+        np.minimum(danger, shift(bombs, -dx, -dy, NO_DANGER), out=danger)
+        far = shift(bombs, -2 * dx, -2 * dy, NO_DANGER)
+        far[shift(blocked, -dx, -dy, True)] = NO_DANGER
+        if ore_blocks is not None:
+            far[ore_blocks] = NO_DANGER
+        np.minimum(danger, far, out=danger)
+    return danger
+
+
+class DangerMap:
+    """Dense grid of the earliest detonation tick reaching each tile.
+
+    ticks is the array for vectorised use and rows the same values as nested
+    lists, which are quicker to index one tile at a time.
+    """
+
+    def __init__(self, detonations, blocked, ore_blocks=None):
+        self.ticks = danger_ticks(detonations, blocked, ore_blocks)
+        self.rows = self.ticks.tolist()
+        self.width, self.height = self.ticks.shape
+
+    @classmethod
+    def from_game_state(cls, game_state, planted, fuse=35, ore_blocks_stop=True):
+        """DangerMap of bombs planted at {location: tick}, on a GameState"""
+        width, height = game_state.size
+        blocks = game_state.all_blocks + list(game_state.bombs)
+        ore_blocks = None
+        if ore_blocks_stop:
+            ore_blocks = locations_to_grid(game_state.ore_blocks, width, height)
+        return cls(
+            {location: tick + fuse for location, tick in planted.items()},
+            locations_to_grid(blocks, width, height),
+            ore_blocks,
+        )
+
+    def get(self, location):
+        """Detonation tick of location, NO_DANGER off the arena"""
+        x, y = location
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.rows[x][y]
+        return NO_DANGER
+
+    def in_blast(self):
+        """Bool grid of the tiles some pending blast reaches"""
+        return self.ticks != NO_DANGER
+
+
+def bombing_values(
+    grids,
+    ore_hits,
+    tracked_bombs,
+    bomb_map,
+    game_stage,
+    ammo,
+    attack_enemy,
+    ammo_weighting,
+    min_ammo_weighting,
+    hide_in_cover=False,
+    player_location=None,
+):
+    """Agent.bombing_value for every tile at once.
+
+    ore_hits holds the hits each ore block still needs, tracked_bombs marks the
+    agent's own bomb records and bomb_map marks every tile in a pending blast.
+    hide_in_cover selects bruhbot's end game rule, where a waiting tile must be
+    fully surrounded and not the tile we're on, instead of fully open.
+    """
+    # Pickup points
+    points = np.zeros((grids.width, grids.height))
+    treasure = grids.treasure & ~grids.bombs
+    pickup = grids.ammo & ~grids.bombs
+    points[treasure] = 1
+    points[pickup] = max(ammo_weighting - ammo, min_ammo_weighting)
+
+    if ammo > 0:
+        # Points for a tile caught in a blast
+        if game_stage == MIDDLE:
+            ore_worth = grids.ore_blocks & (ore_hits > 0) & (ore_hits <= ammo)
+        elif game_stage == OPENING:
+            ore_worth = grids.ore_blocks & (ore_hits == 1)
+        else:
+            ore_worth = np.zeros_like(grids.ore_blocks)
+        tile_points = np.where(grids.soft_blocks & ~bomb_map, 2.0, 0.0)
+        if attack_enemy:
+            tile_points[grids.enemy & ~grids.bombs] = 0.5
+        tile_points[ore_worth] = 10 / ore_hits[ore_worth]
+
+        blast_points = np.zeros_like(points)
+        for dx, dy in DIRECTIONS:
+            near = shift(tile_points, dx, dy, 0.0)
+            near[shift(tracked_bombs, dx, dy, False)] = 0
+            far = shift(tile_points, 2 * dx, 2 * dy, 0.0)
+            far_blocked = shift(grids.blocked, dx, dy, True) | shift(
+                grids.ore_blocks, 2 * dx, 2 * dy, True
+            )
+            far[far_blocked] = 0
+            blast_points += near + far
+
+        if game_stage == END and not attack_enemy:
+            # Tiles worth waiting on replace any bombing points
+            if hide_in_cover:
+                waiting = np.ones_like(grids.occupied)
+                for dx, dy in DIRECTIONS:
+                    waiting &= shift(grids.occupied, dx, dy, True)
+                if player_location is not None:
+                    waiting[player_location] = False
+            else:
+                waiting = np.ones_like(grids.occupied)
+                for dx, dy in DIRECTIONS:
+                    waiting &= ~shift(grids.occupied, dx, dy, False)
+            waiting &= points == 0
+            blast_points[waiting] = 10
+        points += blast_points
+    return points
+
+
+def value_buckets(values, mask):
+    """Groups the positive values under mask into {value: [coords, ...]}"""
+    worth_attempting = {}
+    for x, y in np.argwhere(mask & (values > 0)).tolist():
+        worth_attempting.setdefault(float(values[x, y]), []).append((x, y))
+    return worth_attempting
+
+
+def dilate(mask, radius=2):
+    """Grows mask along both axes by radius, the reach of a blast"""
+    grown = mask.copy()
+    for dx, dy in DIRECTIONS:
+        for distance in range(1, radius + 1):
+            grown |= shift(mask, dx * distance, dy * distance, False)
+    return grown
+
+
+def merge_boxes(boxes):
+    """Merges (x0, y0, x1, y1) boxes, ends exclusive, until none overlap or touch"""
+    merged = []
+    for box in boxes:
+        x0, y0, x1, y1 = box
+        # Absorbing a box can make it reach ones it was clear of, so go again
+        absorbed = True
+        while absorbed:
+            absorbed = False
+            for other in merged:
+                ox0, oy0, ox1, oy1 = other
+                if x0 <= ox1 and ox0 <= x1 and y0 <= oy1 and oy0 <= y1:
+                    merged.remove(other)
+                    x0, y0 = min(x0, ox0), min(y0, oy0)
+                    x1, y1 = max(x1, ox1), max(y1, oy1)
+                    absorbed = True
+                    break
+        merged.append((x0, y0, x1, y1))
+    return merged
+
+
+class ValueMap:
+    """Persistent bombing_values grid that is only rescored where it can change.
+
+    A tile's value only depends on tiles within blast radius of it, so each
+    update diffs the inputs against the previous tick and rescores a window
+    around each cluster of tiles that changed, so changes far apart don't
+    drag the whole arena in between along. Once the windows would cover
+    FULL_RESCORE_SHARE of the arena, or the scalar settings (stage, ammo,
+    weighting) change, everything is rescored in one pass.
+    """
+
+    FULL_RESCORE_SHARE = 0.5
+
+    def __init__(self):
+        self.values = None
+        self.layers = None
+        self.settings = None
+        self.rescored = 0
+
+    def update(
+        self,
+        grids,
+        ore_hits,
+        tracked_bombs,
+        bomb_map,
+        game_stage,
+        ammo,
+        attack_enemy,
+        ammo_weighting,
+        min_ammo_weighting,
+        hide_in_cover=False,
+        player_location=None,
+    ):
+        player = np.zeros((grids.width, grids.height), dtype=bool)
+        if hide_in_cover and player_location is not None:
+            player[player_location] = True
+        layers = [getattr(grids, name) for name in BoardGrids.MASKS]
+        layers += [ore_hits, tracked_bombs, bomb_map, player]
+        settings = (
+            game_stage,
+            ammo,
+            attack_enemy,
+            ammo_weighting,
+            min_ammo_weighting,
+            hide_in_cover,
+        )
+
+        def score(window, x_slice, y_slice):
+            location = None
+            if hide_in_cover and player[x_slice, y_slice].any():
+                location = tuple(np.argwhere(player[x_slice, y_slice])[0].tolist())
+            return bombing_values(
+                window,
+                ore_hits[x_slice, y_slice],
+                tracked_bombs[x_slice, y_slice],
+                bomb_map[x_slice, y_slice],
+                game_stage,
+                ammo,
+                attack_enemy,
+                ammo_weighting,
+                min_ammo_weighting,
+                hide_in_cover=hide_in_cover,
+                player_location=location,
+            )
+
+        everything = slice(None)
+        if self.values is None or settings != self.settings:
+            self.values = score(grids, everything, everything)
+            self.rescored = self.values.size
+        else:
+            changed = np.zeros_like(player)
+            for new, old in zip(layers, self.layers):
+                changed |= new != old
+            self.rescored = 0
+            if changed.any():
+                dirty = dilate(changed)
+                # The tiles each change reaches, clustered where they meet
+                boxes = merge_boxes(
+                    (
+                        max(x - 2, 0),
+                        max(y - 2, 0),
+                        min(x + 3, grids.width),
+                        min(y + 3, grids.height),
+                    )
+                    for x, y in zip(*np.nonzero(changed))
+                )
+                windows = [
+                    (
+                        slice(max(x0 - 2, 0), min(x1 + 2, grids.width)),
+                        slice(max(y0 - 2, 0), min(y1 + 2, grids.height)),
+                    )
+                    for x0, y0, x1, y1 in boxes
+                ]
+                area = sum(
+                    (x_slice.stop - x_slice.start) * (y_slice.stop - y_slice.start)
+                    for x_slice, y_slice in windows
+                )
+                if area >= self.FULL_RESCORE_SHARE * self.values.size:
+                    self.values = score(grids, everything, everything)
+                    self.rescored = self.values.size
+                else:
+                    for (x0, y0, x1, y1), (x_slice, y_slice) in zip(boxes, windows):
+                        window = grids.window(x_slice, y_slice)
+                        rescored = score(window, x_slice, y_slice)
+                        wx0, wy0 = x_slice.start, y_slice.start
+                        inner = rescored[x0 - wx0 : x1 - wx0, y0 - wy0 : y1 - wy0]
+                        box_dirty = dirty[x0:x1, y0:y1]
+                        self.values[x0:x1, y0:y1][box_dirty] = inner[box_dirty]
+                    self.rescored = int(dirty.sum())
+        self.layers = layers
+        self.settings = settings
+        return self.values
@@ -0,0 +1,375 @@
+"""Headless stand-in for the coderone.dungeon engine.
+
+Implements the parts of GameState and PlayerState the agents use, and a
+seeded Game that steps two agents through a match without the real engine:
+
+    install_stand_in()
+    game = Game(load_agent("primary-agent.py"), load_agent("random-agent.py"), seed=3)
+    result = game.run()
+"""
+import importlib.util
+import os
+import random
+import sys
+import time
+import types
+
+
+class PlayerState:
+    """What an agent is told about itself each tick"""
+
+    def __init__(self, id, location, ammo, hp, reward, power):
+        self.id = id
+        self.location = location
+        self.ammo = ammo
+        self.hp = hp
+        self.reward = reward
+        self.power = power
+
+
+class GameState:
+    """Snapshot of the arena handed to agents each tick"""
+
+    def __init__(
+        self,
+        size,
+        tick_number,
+        indestructible_blocks,
+        soft_blocks,
+        ore_blocks,
+        bombs,
+        ammo,
+        treasure,
+        players,
+    ):
+        self.size = size
+        self.tick_number = tick_number
+        self.indestructible_blocks = indestructible_blocks
+        self.soft_blocks = soft_blocks
+        self.ore_blocks = ore_blocks
+        self.bombs = bombs
+        self.ammo = ammo
+        self.treasure = treasure
+        self._players = players
+
+        # Later entries win, so a bomb hides the player standing on it
+        occupancy = {}
+        for location in treasure:
+            occupancy[location] = "t"
+        for location in ammo:
+            occupancy[location] = "a"
+        for pid, location in players:
+            occupancy[location] = pid
+        for location in indestructible_blocks:
+            occupancy[location] = "ib"
+        for location in soft_blocks:
+            occupancy[location] = "sb"
+        for location in ore_blocks:
+            occupancy[location] = "ob"
+        for location in bombs:
+            occupancy[location] = "b"
+        self._occupancy = occupancy
+
+    @property
+    def all_blocks(self):
+        return self.indestructible_blocks + self.soft_blocks + self.ore_blocks
+
+    def is_in_bounds(self, location):
+        return 0 <= location[0] < self.size[0] and 0 <= location[1] < self.size[1]
+
+    def is_occupied(self, location):
+        return location in self._occupancy
+
+    def entity_at(self, location):
+        return self._occupancy.get(location)
+
+    def opponents(self, excluding_player_pid):
+        return [
+            location for pid, location in self._players if pid != excluding_player_pid
+        ]
+
+
+class Player:
+    """Engine side state for one player"""
+
+    def __init__(self, id, agent, location, ammo, hp, power):
+        self.id = id
+        self.agent = agent
+        self.location = location
+        self.ammo = ammo
+        self.hp = hp
+        self.reward = 0
+        self.power = power
+        self.latencies = []
+        self.missed_turns = 0
+        self.errors = 0
+        self.busy_until = 0  # Tick the agent is still thinking until
+
+    def state(self):
+        return PlayerState(
+            self.id, self.location, self.ammo, self.hp, self.reward, self.power
+        )
+
+
+class Game:
+    """A seeded match between two agents"""
+
+    SIZE = (12, 10)
+    MAX_TICKS = 1800
+
+    INDESTRUCTIBLE_BLOCK_COUNT = 16
+    SOFT_BLOCK_COUNT = 36
+    ORE_BLOCK_COUNT = 6
+    ORE_HITS = 3
+
+    START_AMMO = 3
+    START_HP = 3
+    BLAST_POWER = 2
+    BOMB_FUSE = 35
+
+    AMMO_SPAWN_INTERVAL = 30
+    TREASURE_SPAWN_INTERVAL = 60
+
+    SOFT_BLOCK_REWARD = 2
+    ORE_BLOCK_REWARD = 10
+    TREASURE_REWARD = 1
+    HIT_REWARD = 25
+
+    MOVES = {"u": (0, 1), "d": (0, -1), "l": (-1, 0), "r": (1, 0)}
+    BOMB_ACTIONS = {"b", "p"}
+
+    def __init__(self, agent_a, agent_b, seed=0, max_ticks=None, tick_time=None):
+        """tick_time, in seconds, drops moves that take longer than it to decide"""
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.width, self.height = self.SIZE
+        self.max_ticks = self.MAX_TICKS if max_ticks is None else max_ticks
+        self.tick_time = tick_time
+        self.tick_number = 0
+
+        free = [(x, y) for x in range(self.width) for y in range(self.height)]
+        self.rng.shuffle(free)
+        self.indestructible_blocks = set(free[: self.INDESTRUCTIBLE_BLOCK_COUNT])
+        del free[: self.INDESTRUCTIBLE_BLOCK_COUNT]
+        self.soft_blocks = set(free[: self.SOFT_BLOCK_COUNT])
+        del free[: self.SOFT_BLOCK_COUNT]
+        self.ore_blocks = {
+            location: self.ORE_HITS for location in free[: self.ORE_BLOCK_COUNT]
+        }
+        del free[: self.ORE_BLOCK_COUNT]
+        self.bombs = {}  # location: (tick placed, owner id)
+        self.ammo = set()
+        self.treasure = set()
+        self.players = [
+            Player(
+                pid, agent, free.pop(), self.START_AMMO, self.START_HP, self.BLAST_POWER
+            )
+            for pid, agent in enumerate((agent_a, agent_b))
+        ]
+
+    def is_in_bounds(self, location):
+        return 0 <= location[0] < self.width and 0 <= location[1] < self.height
+
+    def is_blocked(self, location):
+        return (
+            location in self.indestructible_blocks
+            or location in self.soft_blocks
+            or location in self.ore_blocks
+            or location in self.bombs
+        )
+
+    def free_tiles(self):
+        taken = {player.location for player in self.players}
+        return [
+            (x, y)
+            for x in range(self.width)
+            for y in range(self.height)
+            if (x, y) not in taken
+            and not self.is_blocked((x, y))
+            and (x, y) not in self.ammo
+            and (x, y) not in self.treasure
+        ]
+
+    def game_state(self):
+        return GameState(
+            self.SIZE,
+            self.tick_number,
+            list(self.indestructible_blocks),
+            list(self.soft_blocks),
+            list(self.ore_blocks),
+            list(self.bombs),
+            list(self.ammo),
+            list(self.treasure),
+            [(player.id, player.location) for player in self.players],
+        )
+
+    def get_actions(self):
+        game_state = self.game_state()
+        actions = {}
+        for player in self.players:
+            if player.busy_until > self.tick_number:
+                player.missed_turns += 1
+                continue
+            start = time.perf_counter()
+            try:
+                action = player.agent.next_move(game_state, player.state())
+            except Exception:  # The engine carries on when an agent crashes
+                player.errors += 1
+                action = None
+            latency = time.perf_counter() - start
+            player.latencies.append(latency)
+            if self.tick_time is not None and latency > self.tick_time:
+                # The real engine moves on without the agent until it answers
+                player.busy_until = self.tick_number + int(latency / self.tick_time)
+                player.missed_turns += 1
+                continue
+            actions[player.id] = action
+        return actions
+
+    def apply_actions(self, actions):
+        for player in self.players:
+            action = actions.get(player.id)
+            if action in self.BOMB_ACTIONS:
+                if player.ammo > 0 and player.location not in self.bombs:
+                    player.ammo -= 1
+                    self.bombs[player.location] = (self.tick_number, player.id)
+            elif action in self.MOVES:
+                dx, dy = self.MOVES[action]
+                target = (player.location[0] + dx, player.location[1] + dy)
+                if (
+                    self.is_in_bounds(target)
+                    and not self.is_blocked(target)
+                    and all(other.location != target for other in self.players)
+                ):
+                    player.location = target
+
+    def collect_pickups(self):
+        for player in self.players:
+            if player.location in self.ammo:
+                self.ammo.remove(player.location)
+                player.ammo += 1
+            elif player.location in self.treasure:
+                self.treasure.remove(player.location)
+                player.reward += self.TREASURE_REWARD
+
+    def detonate(self, location, hit_players):
+        """Explodes the bomb at location along with any bombs its blast reaches"""
+        _, owner = self.bombs.pop(location)
+        blast = [location]
+        x, y = location
+        for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+            for distance in range(1, self.BLAST_POWER + 1):
+                tile = (x + dx * distance, y + dy * distance)
+                if not self.is_in_bounds(tile):
+                    break
+                blast.append(tile)
+                if self.is_blocked(tile):
+                    break
+        for tile in blast:
+            if tile in self.soft_blocks:
+                self.soft_blocks.remove(tile)
+                self.players[owner].reward += self.SOFT_BLOCK_REWARD
+            elif tile in self.ore_blocks:
+                self.ore_blocks[tile] -= 1
+                if self.ore_blocks[tile] <= 0:
+                    del self.ore_blocks[tile]
+                    self.players[owner].reward += self.ORE_BLOCK_REWARD
+            elif tile in self.bombs:
+                self.detonate(tile, hit_players)
+            self.ammo.discard(tile)
+            self.treasure.discard(tile)
+            for player in self.players:
+                if player.location == tile and player.id not in hit_players:
+                    hit_players.add(player.id)
+                    player.hp -= 1
+                    if player.id != owner:
+                        self.players[owner].reward += self.HIT_REWARD
+
+    def explode_bombs(self):
+        due = [
+            location
+            for location, (tick, _) in self.bombs.items()
+            if self.tick_number - tick >= self.BOMB_FUSE
+        ]
+        hit_players = set()
+        for location in due:
+            if location in self.bombs:  # May have gone off in a chain already
+                self.detonate(location, hit_players)
+
+    def spawn_pickups(self):
+        for interval, pickups in (
+            (self.AMMO_SPAWN_INTERVAL, self.ammo),
+            (self.TREASURE_SPAWN_INTERVAL, self.treasure),
+        ):
+            if self.tick_number % interval == 0:
+                free = self.free_tiles()
+                if free:
+                    pickups.add(self.rng.choice(free))
+
+    def is_over(self):
+        return self.tick_number >= self.max_ticks or any(
+            player.hp <= 0 for player in self.players
+        )
+
+    def step(self):
+        self.apply_actions(self.get_actions())
+        self.collect_pickups()
+        self.explode_bombs()
+        self.tick_number += 1
+        self.spawn_pickups()
+
+    def run(self):
+        while not self.is_over():
+            self.step()
+        return self.result()
+
+    def winner(self):
+        a, b = self.players
+        if (a.hp > 0) != (b.hp > 0):
+            return a.id if a.hp > 0 else b.id
+        if a.reward != b.reward:
+            return a.id if a.reward > b.reward else b.id
+        return None
+
+    def result(self):
+        return {
+            "seed": self.seed,
+            "ticks": self.tick_number,
+            "winner": self.winner(),
+            "scores": [player.reward for player in self.players],
+            "hp": [player.hp for player in self.players],
+            "latencies": [player.latencies for player in self.players],
+            "missed_turns": [player.missed_turns for player in self.players],
+            "errors": [player.errors for player in self.players],
+        }
+
+
+def install_stand_in():
+    """Lets agent files import coderone.dungeon.agent when the engine is missing"""
+    try:
+        import coderone.dungeon.agent  # noqa: F401
+    except ImportError:
+        names = ("coderone", "coderone.dungeon", "coderone.dungeon.agent")
+        for name in names:
+            sys.modules.setdefault(name, types.ModuleType(name))
+        sys.modules["coderone.dungeon.agent"].GameState = GameState
+        sys.modules["coderone.dungeon.agent"].PlayerState = PlayerState
+
+
+def load_agent_class(path):
+    """Imports an agent file by path and returns its agent class"""
+    name = os.path.splitext(os.path.basename(path))[0].replace("-", "_")
+    directory = os.path.dirname(os.path.abspath(path))
+    if directory not in sys.path:
+        sys.path.insert(0, directory)  # For the shared modules agents import
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    for attribute in ("Agent", "agent"):
+        if hasattr(module, attribute):
+            return getattr(module, attribute)
+    raise ValueError("No agent class found in {}".format(path))
+
+
+def load_agent(path):
+    return load_agent_class(path)()
@@ -0,0 +1,204 @@
+"""Fixed layout board snapshot in shared memory, read by helper processes"""
+import contextlib
+from multiprocessing import shared_memory
+
+import numpy as np
+
+EMPTY, SOLID, SOFT, ORE, AMMO, TREASURE = range(6)  # Cell types
+NO_BOMB = -1
+NO_OWNER = -1
+NO_ORE = -1  # Ore hits of a tile without ore, where 0 is an ore about to go
+MAX_ORE_HITS = np.iinfo(np.int8).max
+
+HEADER = 4  # int64 sequence, tick, width, height
+PLAYER_FIELDS = 5  # int32 x, y, ammo, hp, reward
+PLAYER_COUNT = 2
+READ_ATTEMPTS = 1000  # Before read gives up on a writer that never finished
+
+
+def get_layout(width, height):
+    """(name, dtype, shape, offset) of each array, and the total size in bytes"""
+    cell_count = width * height
+    fields = (
+        ("header", np.int64, (HEADER,)),
+        ("cells", np.uint8, (cell_count,)),
+        ("bomb_ticks", np.int32, (cell_count,)),
+        ("owners", np.int8, (cell_count,)),
+        ("ore_hits", np.int8, (cell_count,)),
+        ("players", np.int32, (PLAYER_COUNT, PLAYER_FIELDS)),
+    )
+    layout = []
+    offset = 0
+    for name, dtype, shape in fields:
+        itemsize = np.dtype(dtype).itemsize
+        offset = -(-offset // itemsize) * itemsize  # Aligned for the dtype
+        layout.append((name, dtype, shape, offset))
+        offset += itemsize * int(np.prod(shape))
+    return layout, offset
+
+
+def to_cells(mask, cell_count):
+    data = np.frombuffer(mask.to_bytes((cell_count + 7) // 8, "little"), np.uint8)
+    return np.unpackbits(data, bitorder="little")[:cell_count].astype(bool)
+
+
+def to_mask(cells):
+    return int.from_bytes(np.packbits(cells, bitorder="little").tobytes(), "little")
+
+
+class SharedBoard:
+    """One tick of the arena in shared memory, in ArenaState.pack's terms.
+
+    Every array is indexed by tile id x + y * width: the cell type, the tick
+    a bomb goes off and its owner, and ore hits left, then each player's
+    position, ammo, hp and reward. The writer makes the sequence odd while
+    it writes and even again once done, so a reader that sees the same even
+    sequence before and after copying out holds a whole tick, and can tell
+    from the sequence whether it is the tick it was asked about. Readers
+    attach by name and map the arrays read-only. A search that only needs
+    the tiles it can walk, like pathing.PathWorkers, can publish just
+    those with write_blocked.
+    """
+
+    def __init__(self, size=None, name=None):
+        """Creates a board for an arena of size, or attaches to the one at name"""
+        if name is None:
+            width, height = size
+            _, byte_count = get_layout(width, height)
+            self.memory = shared_memory.SharedMemory(create=True, size=byte_count)
+            self.owner = True
+        else:
+            self.memory = shared_memory.SharedMemory(name)
+            width, height = np.ndarray((HEADER,), np.int64, self.memory.buf)[2:]
+            self.owner = False
+        self.width, self.height = int(width), int(height)
+        self.cell_count = self.width * self.height
+        layout, _ = get_layout(self.width, self.height)
+        self.fields = [field for field, _, _, _ in layout]
+        for field, dtype, shape, offset in layout:
+            array = np.ndarray(shape, dtype, self.memory.buf, offset)
+            array.flags.writeable = self.owner
+            setattr(self, field, array)
+        if self.owner:
+            self.header[:] = (0, 0, self.width, self.height)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    @property
+    def sequence(self):
+        return int(self.header[0])
+
+    def write(self, packed):
+        """Publishes the state ArenaState.pack gave"""
+        _, tick, solid, soft, ore, ammo, treasure, bombs, ore_hits, players = packed
+        width = self.width
+        for location, hits in ore_hits:  # Before the board is touched
+            if not 0 <= hits <= MAX_ORE_HITS:
+                raise ValueError("Ore hits out of range: {} {}".format(location, hits))
+        with self.writing():
+            self.cells[:] = EMPTY
+            # Later types win, a block hides the pickup spawned under it
+            for cell, mask in (
+                (TREASURE, treasure),
+                (AMMO, ammo),
+                (ORE, ore),
+                (SOFT, soft),
+                (SOLID, solid),
+            ):
+                self.cells[to_cells(mask, self.cell_count)] = cell
+            self.bomb_ticks[:] = NO_BOMB
+            self.owners[:] = NO_OWNER
+            for (x, y), (explodes, owner) in bombs:
+                self.bomb_ticks[x + y * width] = explodes
+                self.owners[x + y * width] = NO_OWNER if owner is None else owner
+            self.ore_hits[:] = NO_ORE
+            for (x, y), hits in ore_hits:
+                self.ore_hits[x + y * width] = hits
+            for pid, ((x, y), player_ammo, hp, reward) in enumerate(players):
+                self.players[pid] = (x, y, player_ammo, hp, reward)
+            self.header[1] = tick
+
+    def write_blocked(self, blocked):
+        """Publishes only a bitmask of the tiles that can't be walked onto, as
+        SOLID cells, for searches that need nothing else of the tick
+        """
+        cells = np.where(to_cells(blocked, self.cell_count), SOLID, EMPTY)
+        with self.writing():
+            self.cells[:] = cells
+
+    @contextlib.contextmanager
+    def writing(self):
+        """Holds the sequence odd while writing, and even again however it ends,
+        or readers would wait on us forever
+        """
+        self.header[0] += 1
+        try:
+            yield
+        finally:
+            self.header[0] += 1
+
+    def copy(self, fields):
+        """(sequence, copies of fields) from one whole write, or None if none
+        could be had in READ_ATTEMPTS tries
+        """
+        for _ in range(READ_ATTEMPTS):
+            sequence = int(self.header[0])
+            if sequence % 2:
+                continue  # Mid write
+            copies = [getattr(self, field).copy() for field in fields]
+            if int(self.header[0]) == sequence:
+                return sequence, copies
+        return None
+
+    def read_blocked(self):
+        """(sequence, bitmask) of the tiles write_blocked marked, or None"""
+        copied = self.copy(("cells",))
+        if copied is None:
+            return None
+        sequence, (cells,) = copied
+        return sequence, to_mask(cells == SOLID)
+
+    def read(self):
+        """(sequence, packed) of the last whole tick written, for ArenaState.unpack,
+        or None if no whole tick could be read in READ_ATTEMPTS tries
+        """
+        fields = ("header", "cells", "bomb_ticks", "owners", "ore_hits", "players")
+        copied = self.copy(fields)
+        if copied is None:
+            return None
+        sequence, (header, cells, bomb_ticks, owners, ore_hits, players) = copied
+        tick = int(header[1])
+        players = players.tolist()
+
+        width = self.width
+        bombs = []
+        for index in np.flatnonzero(bomb_ticks != NO_BOMB).tolist():
+            owner = int(owners[index])
+            bomb = (int(bomb_ticks[index]), None if owner == NO_OWNER else owner)
+            bombs.append(((index % width, index // width), bomb))
+        ore_hits = tuple(
+            ((index % width, index // width), int(ore_hits[index]))
+            for index in np.flatnonzero(ore_hits != NO_ORE).tolist()
+        )
+        packed = (
+            (self.width, self.height),
+            tick,
+            to_mask(cells == SOLID),
+            to_mask(cells == SOFT),
+            to_mask(cells == ORE),
+            to_mask(cells == AMMO),
+            to_mask(cells == TREASURE),
+            tuple(bombs),
+            ore_hits,
+            tuple(((x, y), ammo, hp, reward) for x, y, ammo, hp, reward in players),
+        )
+        return sequence, packed
+
+    def close(self):
+        for field in self.fields:  # The memory can't close under live views
+            setattr(self, field, None)
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
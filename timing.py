@@ -0,0 +1,159 @@
+"""Move time budgeting for agents"""
+import atexit
+import time
+
+profiles = {}  # Name: Profile every agent loaded under that name records into
+dumped = []  # Names of the profiles printed at exit, in the order asked for
+
+
+class OutOfTime(Exception):
+    """Raised when a move's time budget has run out"""
+
+
+class Deadline:
+    """Monotonic deadline that the heavy phases of a move check against"""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.end = time.monotonic() + budget
+
+    def remaining(self):
+        return self.end - time.monotonic()
+
+    def expired(self):
+        return time.monotonic() >= self.end
+
+    def check(self):
+        if time.monotonic() >= self.end:
+            raise OutOfTime
+
+    def cancel(self):
+        """Expires the deadline now, so the next check raises OutOfTime"""
+        self.end = time.monotonic()
+
+
+class Histogram:
+    """HDR style latency histogram with fixed relative precision.
+
+    Values are recorded as whole microseconds into log-linear buckets, each
+    power of two split into SUB_BUCKET_COUNT // 2 slots, so recording is O(1)
+    and any reported value is within 1/64 of the true one however long the
+    game runs.
+    """
+
+    SUB_BUCKET_BITS = 7
+    SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+    SUB_BUCKET_HALF = SUB_BUCKET_COUNT // 2
+
+    def __init__(self):
+        self.counts = {}  # Bucket index: count
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def index(self, value):
+        bucket = max(value.bit_length() - self.SUB_BUCKET_BITS, 0)
+        return bucket * self.SUB_BUCKET_HALF + (value >> bucket)
+
+    def highest_equivalent(self, index):
+        """Largest value that is recorded into the bucket at index"""
+        if index < self.SUB_BUCKET_COUNT:
+            return index
+        bucket = index // self.SUB_BUCKET_HALF - 1
+        sub_bucket = index - bucket * self.SUB_BUCKET_HALF
+        return ((sub_bucket + 1) << bucket) - 1
+
+    def record(self, seconds):
+        value = int(seconds * 1000000)
+        index = self.index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, fraction):
+        """Value in seconds that fraction of the recorded values are at or under"""
+        if not self.count:
+            return 0.0
+        wanted = max(fraction * self.count, 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= wanted:
+                return min(self.highest_equivalent(index), self.max) / 1000000
+        return self.max / 1000000
+
+    def mean(self):
+        return self.total / max(self.count, 1) / 1000000
+
+
+class Phase:
+    """Context manager that times one pass through a phase of a move"""
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        # Recorded even when the phase ran out of time, those are the spikes
+        self.histogram.record(time.perf_counter() - self.start)
+
+
+class Profile:
+    """Per phase latency histograms kept across a whole game"""
+
+    PERCENTILES = (0.5, 0.9, 0.99)
+
+    def __init__(self):
+        self.phases = {}  # Name: Phase, in the order first seen
+
+    def phase(self, name):
+        if name not in self.phases:
+            self.phases[name] = Phase(Histogram())
+        return self.phases[name]
+
+    def summary(self):
+        header = ["phase", "count", "mean ms"]
+        header += ["p{:g} ms".format(100 * fraction) for fraction in self.PERCENTILES]
+        header.append("max ms")
+        row_format = "{:<32}" + "{:>10}" * (len(header) - 1)
+        lines = [row_format.format(*header)]
+        for name, phase in self.phases.items():
+            histogram = phase.histogram
+            times = [histogram.mean()]
+            times += [histogram.percentile(fraction) for fraction in self.PERCENTILES]
+            times.append(histogram.max / 1000000)
+            cells = ["{:.3f}".format(1000 * seconds) for seconds in times]
+            lines.append(row_format.format(name, histogram.count, *cells))
+        return "\n".join(lines)
+
+    def dump(self, title=None):
+        if self.phases:
+            if title is not None:
+                print(title)
+            print(self.summary())
+
+
+def get_profile(name):
+    """The Profile shared by every agent of the module name, across every load"""
+    if name not in profiles:
+        profiles[name] = Profile()
+    return profiles[name]
+
+
+def dump_at_exit(name):
+    """Prints the profile of name when the interpreter exits, once however
+    often it is asked for
+    """
+    if not dumped:
+        atexit.register(dump_profiles)
+    if name not in dumped:
+        dumped.append(name)
+
+
+def dump_profiles():
+    for name in dumped:
+        profiles[name].dump("Move timings for {}".format(name))
@@ -0,0 +1,193 @@
+"""Round robin tournament between agent files, played on the local simulator.
+
+    python tournament.py --games 20 primary-agent.py bruhbot.py random-agent.py
+
+With no agent files every competing variant is entered. Each pairing plays
+the same seeds with sides swapped every other game, and the summary table is
+printed in a stable order so runs from different commits can be diffed.
+"""
+import argparse
+import contextlib
+import itertools
+import multiprocessing
+import os
+import random
+
+import simulator
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))  # Where the agent files are
+AGENTS = [
+    "primary-agent.py",
+    "bruhbot.py",
+    "no-centre.py",
+    "aggressive-agent.py",
+    "violent-agent.py",
+    "ore-lover.py",
+    "mean-heuristic-weighted.py",
+    "iteration-one.py",
+    "iteration-two.py",
+    "iteration-three.py",
+    "iteration-four.py",
+    "iteration-five.py",
+    "scrim-one.py",
+    "scrim-two.py",
+    "random-agent.py",
+    "wanderer.py",
+]
+
+ROW_FORMAT = "{:<28} {:>5} {:>6} {:>6} {:>7} {:>8} {:>8} {:>7} {:>6}"
+HEADER = ("agent", "games", "win%", "draw%", "score", "mean ms", "p99 ms")
+HEADER += ("missed", "errors")
+
+agent_classes = {}  # Per worker process cache of loaded agent files
+
+
+def init_worker():
+    simulator.install_stand_in()
+
+
+def get_agent_class(path):
+    if path not in agent_classes:
+        agent_classes[path] = simulator.load_agent_class(path)
+    return agent_classes[path]
+
+
+def play_match(match):
+    path_a, path_b, seed, max_ticks, tick_time = match
+    agent_a = get_agent_class(path_a)()
+    agent_b = get_agent_class(path_b)()
+    random.seed(seed)  # Agents that roll dice play the same game every run
+    game = simulator.Game(
+        agent_a, agent_b, seed=seed, max_ticks=max_ticks, tick_time=tick_time
+    )
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        result = game.run()
+    result["agents"] = [path_a, path_b]
+    return result
+
+
+def get_matches(agents, games, seed, max_ticks, tick_time):
+    matches = []
+    for path_a, path_b in itertools.combinations(agents, 2):
+        for game in range(games):
+            if game % 2:
+                sides = (path_b, path_a)
+            else:
+                sides = (path_a, path_b)
+            matches.append(sides + (seed + game, max_ticks, tick_time))
+    return matches
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class AgentStats:
+    """Running totals for one agent across the tournament"""
+
+    def __init__(self, name):
+        self.name = name
+        self.games = 0
+        self.wins = 0
+        self.draws = 0
+        self.score = 0
+        self.latencies = []
+        self.missed_turns = 0
+        self.errors = 0
+
+    def add(self, result, side):
+        self.games += 1
+        if result["winner"] == side:
+            self.wins += 1
+        elif result["winner"] is None:
+            self.draws += 1
+        self.score += result["scores"][side]
+        self.latencies.extend(result["latencies"][side])
+        self.missed_turns += result["missed_turns"][side]
+        self.errors += result["errors"][side]
+
+    def row(self):
+        games = max(self.games, 1)
+        latencies = self.latencies or [0.0]
+        return ROW_FORMAT.format(
+            os.path.basename(self.name),
+            self.games,
+            "{:.1f}".format(100 * self.wins / games),
+            "{:.1f}".format(100 * self.draws / games),
+            "{:.1f}".format(self.score / games),
+            "{:.2f}".format(1000 * sum(latencies) / len(latencies)),
+            "{:.2f}".format(1000 * percentile(latencies, 0.99)),
+            self.missed_turns,
+            self.errors,
+        )
+
+
+def summarise(agents, results):
+    stats = {path: AgentStats(path) for path in agents}
+    head_to_head = {}  # (agent, opponent): [wins, games]
+    for result in results:
+        for side, path in enumerate(result["agents"]):
+            stats[path].add(result, side)
+            opponent = result["agents"][1 - side]
+            record = head_to_head.setdefault((path, opponent), [0, 0])
+            record[0] += result["winner"] == side
+            record[1] += 1
+
+    ranked = sorted(
+        stats.values(),
+        key=lambda agent: (-agent.wins / max(agent.games, 1), agent.name),
+    )
+    lines = [ROW_FORMAT.format(*HEADER)]
+    lines.extend(agent.row() for agent in ranked)
+
+    lines.append("")
+    lines.append("win% of row against column")
+    names = [agent.name for agent in ranked]
+    lines.append(" " * 28 + "".join("{:>6}".format(i) for i in range(len(names))))
+    for index, name in enumerate(names):
+        cells = []
+        for opponent in names:
+            wins, games = head_to_head.get((name, opponent), (0, 0))
+            cell = round(100 * wins / games) if games else "-"
+            cells.append("{:>6}".format(cell))
+        label = os.path.basename(name)
+        lines.append("{:<24}{:>4}".format(label, index) + "".join(cells))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    agents = [os.path.join(DIRECTORY, name) for name in AGENTS]
+    parser.add_argument("agents", nargs="*", default=agents)
+    parser.add_argument("--games", type=int, default=10, help="matches per pairing")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first match")
+    parser.add_argument("--max-ticks", type=int, default=simulator.Game.MAX_TICKS)
+    parser.add_argument(
+        "--tick-time",
+        type=float,
+        default=0.1,
+        help="seconds before a move counts as missed, 0 to never miss",
+    )
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--output", help="also write the table to this file")
+    args = parser.parse_args()
+
+    matches = get_matches(
+        args.agents, args.games, args.seed, args.max_ticks, args.tick_time or None
+    )
+    with multiprocessing.Pool(args.processes, initializer=init_worker) as pool:
+        results = list(pool.imap_unordered(play_match, matches))
+    results.sort(key=lambda result: (result["agents"], result["seed"]))
+
+    table = summarise(args.agents, results)
+    print(table)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(table + "\n")
+
+
+if __name__ == "__main__":
+    main()
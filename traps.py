@@ -0,0 +1,97 @@
+"""Corridor and dead end analysis of the walkable arena, shared for a tick"""
+
+
+class TrapMap:
+    """Answers where a corridor out of a tile leads, walking each one once.
+
+    A corridor is a run of tiles with a single way onwards. Walking one from
+    a tile ends at a trap, a tile with no way onwards, or at an exit, a tile
+    with two or more. Every step of a walk is stored against the edge it was
+    entered by, so a later walk that joins a corridor part way along, in the
+    same direction, finishes in O(1). Build one per Board, since any change
+    to what can be walked on invalidates it. Walks raise timing.OutOfTime
+    once deadline, if given, has passed.
+    """
+
+    def __init__(self, board, arena, deadline=None):
+        self.board = board
+        self.arena = arena
+        self.deadline = deadline
+        self.open = {}  # Tile: walkable neighbours
+        self.walks = {}  # (from, tile): (end, is_exit, route)
+
+    def get_open(self, location):
+        if location not in self.open:
+            self.open[location] = tuple(
+                tile
+                for tile in self.arena.neighbours[location]
+                if self.board.is_moveable_to(tile)
+            )
+        return self.open[location]
+
+    def is_trap(self, location, skip_cells=()):
+        """True if no walkable tile, other than skip_cells, borders location"""
+        return all(tile in skip_cells for tile in self.get_open(location))
+
+    def walk(self, previous, tile):
+        """(end, is_exit, route) of carrying on into tile from previous.
+
+        route is the reversed path to the end, in generate_path's format and
+        starting from tile. A corridor that loops back on itself ends in a
+        trap where it closes.
+        """
+        key = (previous, tile)
+        steps = []
+        seen = {previous}
+        while key not in self.walks:
+            if self.deadline is not None:
+                self.deadline.check()
+            steps.append(key)
+            seen.add(tile)
+            onward = [next for next in self.get_open(tile) if next != previous]
+            if len(onward) == 1 and onward[0] not in seen:
+                previous, tile = tile, onward[0]
+                key = (previous, tile)
+                continue
+            is_exit = len(onward) > 1
+            self.walks[key] = (tile, is_exit, [tile])
+            steps.pop()
+            break
+        end, is_exit, route = self.walks[key]
+        for step in reversed(steps):
+            route = route + [step[1]]
+            self.walks[step] = (end, is_exit, route)
+        return self.walks[(steps[0] if steps else key)]
+
+    def get_trap_details(self, location, came_from):
+        """(trap, exit) of the corridors leading away from location.
+
+        came_from is never walked back onto. Gives (None, None) for an open
+        tile or a corridor with exits both ways, and a trap with no exit when
+        location is boxed in.
+        """
+        starting_tiles = self.get_open(location)
+        if len(starting_tiles) > 2:
+            return None, None
+        if not starting_tiles:
+            return location, None
+        trap = exit = None
+        for tile in reversed(starting_tiles):
+            end, is_exit, _ = self.walk(came_from, tile)
+            if is_exit:
+                if exit is not None:
+                    return trap, None
+                exit = end
+            else:
+                if trap is not None:
+                    return trap, None
+                trap = end
+        return trap, exit
+
+    def get_escape_path(self, location, came_from):
+        """Path along the corridor to the exit get_trap_details finds, if any"""
+        for tile in self.get_open(location):
+            _, is_exit, route = self.walk(came_from, tile)
+            if is_exit:
+                return list(route)
+        return None
@@ -6,6 +6,8 @@ All it does is walk around the map.
 import time
 import random
 
+from board import Board
+
 
 class agent:
     def __init__(self):
@@ -29,6 +31,7 @@ class agent:
         self.rows = game_state.size[1]
 
         self.game_state = game_state  # for us to refer to later
+        self.board = Board(game_state, player_state)
 
         self.location = player_state.location
 
@@ -77,7 +80,7 @@ class agent:
         # loop through our tiles
         for tile in all_surrounding_tiles:
             # check if the tile is within the boundaries of the game
-            if self.game_state.is_in_bounds(tile):
+            if self.board.is_in_bounds(tile):
                 # if yes, then add them to our list
                 valid_surrounding_tiles.append(tile)
 
@@ -91,9 +94,10 @@ class agent:
         empty_tiles = []
 
         for tile in tiles:
-            if not self.game_state.is_occupied(tile) or self.game_state.entity_at(
-                tile
-            ) in ["a", "t"]:
+            if not self.board.is_occupied(tile) or self.board.entity_at(tile) in [
+                "a",
+                "t",
+            ]:
                 # the tile isn't occupied, so we'll add it to the list
                 empty_tiles.append(tile)
 
@@ -102,7 +106,7 @@ class agent:
     def prioritise_pickups(self, tiles):
         pickups = []
         for tile in tiles:
-            if self.game_state.entity_at(tile) in ["a", "t"]:
+            if self.board.entity_at(tile) in ["a", "t"]:
                 pickups.append(tile)
                 if len(pickups) == 0:
                     return tiles
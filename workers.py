@@ -0,0 +1,131 @@
+"""Long lived worker processes that a move hands work to under a deadline"""
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import os
+
+PARENT_CHECK = 1.0  # Seconds between checks that the parent is still alive
+
+
+def serve(connection, inherited, parent):
+    """Worker loop, runs each (job, function, args) sent and sends (job, result).
+
+    The parent's ends of every pipe the fork copied in are closed, our own
+    included, so the parent dying closes ours and ends the loop. A worker
+    whose parent is gone while some other process holds the pipe open
+    notices by its parent pid changing and ends all the same.
+    """
+    for other in inherited:
+        other.close()
+    while True:
+        try:
+            if not connection.poll(PARENT_CHECK):
+                if os.getppid() != parent:
+                    return
+                continue
+            message = connection.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+        job, function, args = message
+        try:
+            result = function(*args)
+        except Exception:  # A failed call only loses its own result
+            result = None
+        connection.send((job, result))
+
+
+class WorkerPool:
+    """A fixed set of worker processes, started once and reused every tick.
+
+    Each worker has a pipe of its own. run hands a call to each idle worker
+    and gathers what comes back before the deadline. A worker still busy
+    with a late call gets nothing new, and the late result is dropped by
+    its job number when it turns up, so a slow call costs the tick it was
+    slow in and not the ones after.
+    """
+
+    def __init__(self, processes):
+        self.jobs = itertools.count()
+        self.workers = {}  # Connection: process
+        self.busy = {}  # Connection: job it is working on
+        for _ in range(processes):
+            connection, child = multiprocessing.Pipe()
+            inherited = list(self.workers) + [connection]
+            process = multiprocessing.Process(
+                target=serve, args=(child, inherited, os.getpid()), daemon=True
+            )
+            process.start()
+            child.close()
+            self.workers[connection] = process
+
+    def __len__(self):
+        return len(self.workers)
+
+    def idle(self):
+        self.collect(0)
+        return [worker for worker in self.workers if worker not in self.busy]
+
+    def run(self, calls, deadline):
+        """Results of the (function, args) calls that finish before deadline.
+
+        Calls beyond the number of idle workers are not made, and results
+        come back in the order they finished, None for a call that raised.
+        """
+        pending = set()
+        calls = iter(calls)
+        call = next(calls, None)
+        for connection in self.idle():
+            if call is None:
+                break
+            job = next(self.jobs)
+            try:
+                connection.send((job,) + tuple(call))
+            except OSError:  # Died while idle, the call goes to the next one
+                self.drop(connection)
+                continue
+            self.busy[connection] = job
+            pending.add(job)
+            call = next(calls, None)
+        results = []
+        while pending:
+            remaining = deadline.remaining()
+            if remaining <= 0:
+                break
+            for job, result in self.collect(remaining):
+                if job in pending:
+                    pending.remove(job)
+                    results.append(result)
+        return results
+
+    def collect(self, timeout):
+        """(job, result) of every busy worker that answers within timeout"""
+        finished = []
+        ready = multiprocessing.connection.wait(list(self.busy), timeout)
+        for connection in ready:
+            try:
+                finished.append(connection.recv())
+            except (EOFError, OSError):  # The worker died, carry on without it
+                self.drop(connection)
+                continue
+            del self.busy[connection]
+        return finished
+
+    def drop(self, connection):
+        """Forgets a worker whose pipe has broken"""
+        self.workers.pop(connection).join(0)
+        self.busy.pop(connection, None)
+        connection.close()
+
+    def close(self):
+        for connection, process in self.workers.items():
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+        self.workers = {}
+        self.busy = {}